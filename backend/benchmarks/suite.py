@@ -303,7 +303,19 @@ class BenchmarkSuite:
         with open(filepath, "r") as f:
             data = json.load(f)
         
-        self.results = [BenchmarkResult(**r) for r in data["results"]]
+        self.results = self._parse_results(data)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], output_dir: str = "benchmarks/results") -> "BenchmarkSuite":
+        """Crear una suite a partir de datos ya cargados (formato de save_results)."""
+        suite = cls(output_dir=output_dir)
+        suite.results = cls._parse_results(data)
+        return suite
+    
+    @staticmethod
+    def _parse_results(data: Dict[str, Any]) -> List[BenchmarkResult]:
+        """Reconstruir BenchmarkResult desde el formato de save_results."""
+        return [BenchmarkResult(**r) for r in data["results"]]
     
     def print_summary(self):
         """Imprimir resumen de resultados."""
@@ -11,7 +11,7 @@ This module provides REST API endpoints for:
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query, Depends, WebSocket, WebSocketDisconnect
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -660,6 +660,12 @@ def _cleanup_old_validation_jobs():
 
 CELERY_ENABLED = CELERY_ENABLED and CELERY_AVAILABLE
 
+
+def get_celery_enabled() -> bool:
+    """Dependency: whether requests should be dispatched to Celery."""
+    return CELERY_ENABLED
+
+
 app = FastAPI(
     title="Tutti API",
     description="Bus route optimization API",
@@ -2125,6 +2131,7 @@ async def optimize_async(
         default=True,
         description="Activa scoring ML para encadenado de rutas",
     ),
+    celery_enabled: bool = Depends(get_celery_enabled),
 ) -> Dict[str, Any]:
     """
     Encolar optimizaciÃ³n para procesamiento async.
@@ -2158,7 +2165,7 @@ async def optimize_async(
             if db:
                 db.close()
     
-    if CELERY_ENABLED and optimize_task:
+    if celery_enabled and optimize_task:
         try:
             # Encolar tarea Celery
             task = optimize_task.delay(
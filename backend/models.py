@@ -1,15 +1,22 @@
 """
 Pydantic models for Tutti bus route optimization.
+
+Models declare empty ``__slots__``: Pydantic keeps field values in the
+instance ``__dict__``, so this only drops the unused ``__weakref__`` slot,
+which adds up across the thousands of Stop/Route objects of a real import.
 """
 
+from functools import cached_property
 from pydantic import BaseModel, Field, computed_field
-from typing import List, Optional, Tuple
+from typing import Any, List, Optional, Tuple
 from datetime import time
 
 
 class Stop(BaseModel):
     """Represents a bus stop with geographic coordinates and timing info."""
     
+    __slots__ = ()
+    
     name: str
     lat: float
     lon: float
@@ -34,6 +41,8 @@ class Stop(BaseModel):
 class Route(BaseModel):
     """Represents a bus route with multiple stops."""
     
+    __slots__ = ()
+    
     id: str
     name: str
     stops: List[Stop]
@@ -50,15 +59,40 @@ class Route(BaseModel):
     days: List[str] = Field(default_factory=list)  # e.g. ["L","M","Mc","X","V"] for weekdays this route runs
     
     @computed_field
-    @property
+    @cached_property
     def num_students(self) -> int:
-        """Total students across all stops."""
+        """
+        Total students across all stops.
+
+        Summed on first access and cached on the instance. Replacing
+        ``stops`` (assignment or ``model_copy(update=...)``) drops the cache,
+        and so does a deep copy, whose stops can then be edited freely;
+        mutating the original list in place does not.
+        """
         return sum(stop.passengers for stop in self.stops)
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "stops":
+            self.__dict__.pop("num_students", None)
+    
+    def __deepcopy__(self, memo: Optional[dict] = None) -> "Route":
+        copied = super().__deepcopy__(memo)
+        copied.__dict__.pop("num_students", None)
+        return copied
+    
+    def model_copy(self, *, update: Optional[dict] = None, deep: bool = False) -> "Route":
+        copied = super().model_copy(update=update, deep=deep)
+        if deep or (update and "stops" in update):
+            copied.__dict__.pop("num_students", None)
+        return copied
 
 
 class Bus(BaseModel):
     """Represents a bus with capacity and identification."""
     
+    __slots__ = ()
+    
     id: str
     capacity: int
     plate: Optional[str] = None
@@ -67,6 +101,8 @@ class Bus(BaseModel):
 class ScheduleItem(BaseModel):
     """Represents a single scheduled route assignment for a bus."""
     
+    __slots__ = ()
+    
     route_id: str
     start_time: time
     end_time: time
@@ -87,6 +123,8 @@ class ScheduleItem(BaseModel):
 class BusSchedule(BaseModel):
     """Represents a complete schedule for one bus across multiple routes."""
     
+    __slots__ = ()
+    
     bus_id: str
     items: List[ScheduleItem]
     last_loc: Optional[Tuple[float, float]] = None
@@ -27,7 +27,7 @@ import math
 import time as time_module
 import os
 import sys
-from typing import List, Dict, Tuple, Optional, Set, Any
+from typing import TYPE_CHECKING, List, Dict, Tuple, Optional, Set, Any
 from datetime import time
 from dataclasses import dataclass, field
 from copy import deepcopy
@@ -45,6 +45,9 @@ from router_service import (
     save_cache,
 )
 
+if TYPE_CHECKING:
+    import numpy as np
+
 logger = logging.getLogger(__name__)
 
 # ============================================================
@@ -161,6 +164,27 @@ def haversine_travel_minutes(lat1: float, lon1: float, lat2: float, lon2: float)
     return max(5, int((km / FALLBACK_SPEED_KMH) * 60) + DEADHEAD_BUFFER_MINUTES)
 
 
+def haversine_km_matrix(
+    sources: List[Tuple[float, float]],
+    destinations: List[Tuple[float, float]],
+) -> "np.ndarray":
+    """Vectorized haversine_km for every (source, destination) pair."""
+    import numpy as np  # deferred: only the OSRM fallback path needs it
+
+    src = np.asarray(sources, dtype=np.float64).reshape(-1, 2)
+    dst = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    lat1 = src[:, 0][:, None]
+    lon1 = src[:, 1][:, None]
+    lat2 = dst[:, 0][None, :]
+    lon2 = dst[:, 1][None, :]
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2) ** 2
+    km = EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    missing = (src == 0).any(axis=1)[:, None] | (dst == 0).any(axis=1)[None, :]
+    return np.where(missing, 999.0, km)
+
+
 def coords_valid(lat: float, lon: float) -> bool:
     """Check if coordinates are valid."""
     return lat != 0.0 and lon != 0.0 and -90 <= lat <= 90 and -180 <= lon <= 180
@@ -174,6 +198,20 @@ def _fallback_travel_with_connection_buffer(lat1: float, lon1: float, lat2: floa
     return minutes
 
 
+def _fallback_travel_matrix_with_connection_buffer(
+    sources: List[Tuple[float, float]],
+    destinations: List[Tuple[float, float]],
+) -> "np.ndarray":
+    """Matrix form of _fallback_travel_with_connection_buffer (int minutes)."""
+    import numpy as np
+
+    km = haversine_km_matrix(sources, destinations)
+    minutes = np.maximum(5, ((km / FALLBACK_SPEED_KMH) * 60).astype(np.int64) + DEADHEAD_BUFFER_MINUTES)
+    if MIN_CONNECTION_BUFFER_MINUTES > DEADHEAD_BUFFER_MINUTES:
+        minutes += MIN_CONNECTION_BUFFER_MINUTES - DEADHEAD_BUFFER_MINUTES
+    return minutes
+
+
 def _osrm_or_fallback_with_connection_buffer(
     src: Tuple[float, float],
     dst: Tuple[float, float],
@@ -282,16 +320,21 @@ def _capacity_pair_compatible(cap_a: int, cap_b: int) -> bool:
     return True
 
 
-def _jobs_capacity_compatible(job_a: "RouteJob", job_b: "RouteJob") -> bool:
-    a_low, a_high = _job_capacity_range(job_a)
-    b_low, b_high = _job_capacity_range(job_b)
+def _job_capacity_profile(job: "RouteJob") -> Tuple[int, int, int]:
+    """Return (range_low, range_high, capacity) used by pairwise capacity checks."""
+    low, high = _job_capacity_range(job)
+    return (low, high, _job_capacity(job))
+
 
+def _capacity_profiles_compatible(a: Tuple[int, int, int], b: Tuple[int, int, int]) -> bool:
     # Hard rule: bus should not mix routes with disjoint capacity ranges.
-    ranges_overlap = not (a_high < b_low or b_high < a_low)
-    if not ranges_overlap:
+    if a[1] < b[0] or b[1] < a[0]:
         return False
+    return _capacity_pair_compatible(a[2], b[2])
 
-    return _capacity_pair_compatible(_job_capacity(job_a), _job_capacity(job_b))
+
+def _jobs_capacity_compatible(job_a: "RouteJob", job_b: "RouteJob") -> bool:
+    return _capacity_profiles_compatible(_job_capacity_profile(job_a), _job_capacity_profile(job_b))
 
 
 def _ranges_overlap(a_low: int, a_high: int, b_low: int, b_high: int) -> bool:
@@ -967,6 +1010,40 @@ def prepare_jobs(routes: List[Route]) -> Dict[int, List[RouteJob]]:
 # PHASE 1: UNIFIED TRAVEL TIME MATRIX
 # ============================================================
 
+def _travel_times_from_matrix(
+    sources: List[Tuple[float, float]],
+    destinations: List[Tuple[float, float]],
+    matrix_result: Optional[List[List[Optional[float]]]],
+    skip_diagonal: bool,
+) -> Dict[Tuple[int, int], int]:
+    """
+    Convert an OSRM matrix into travel+buffer minutes per (i, j) pair.
+
+    Missing OSRM cells fall back to haversine estimates, computed for the
+    whole matrix in one vectorized pass the first time one is needed.
+    """
+    travel_times: Dict[Tuple[int, int], int] = {}
+    fallback: Optional["np.ndarray"] = None
+    fallback_count = 0
+    for i in range(len(sources)):
+        row = matrix_result[i] if matrix_result else None
+        for j in range(len(destinations)):
+            if skip_diagonal and i == j:
+                continue
+            t = row[j] if row is not None else None
+            if t is not None:
+                travel_times[(i, j)] = int(math.ceil(float(t))) + MIN_CONNECTION_BUFFER_MINUTES
+                continue
+            if fallback is None:
+                fallback = _fallback_travel_matrix_with_connection_buffer(sources, destinations)
+            travel_times[(i, j)] = int(fallback[i, j])
+            fallback_count += 1
+
+    if fallback_count:
+        _RUNTIME_METRICS["osrm_fallback_count"] = int(_RUNTIME_METRICS.get("osrm_fallback_count", 0)) + fallback_count
+    return travel_times
+
+
 def precompute_block_travel_matrix(
     jobs: List[RouteJob], 
     is_entry: bool
@@ -982,19 +1059,7 @@ def precompute_block_travel_matrix(
     destinations = [job.start_loc for job in jobs]
 
     matrix_result = get_travel_time_matrix(sources, destinations)
-
-    travel_times: Dict[Tuple[int, int], int] = {}
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                continue
-            t = matrix_result[i][j] if matrix_result and matrix_result[i][j] is not None else None
-            travel_times[(i, j)] = _osrm_or_fallback_with_connection_buffer(
-                sources[i],
-                destinations[j],
-                t,
-            )
-    return travel_times
+    return _travel_times_from_matrix(sources, destinations, matrix_result, skip_diagonal=True)
 
 
 def compute_cross_block_travel(
@@ -1013,17 +1078,7 @@ def compute_cross_block_travel(
     destinations = [job.start_loc for job in dst_jobs]
 
     matrix_result = get_travel_time_matrix(sources, destinations)
-
-    travel_times: Dict[Tuple[int, int], int] = {}
-    for i in range(len(src_jobs)):
-        for j in range(len(dst_jobs)):
-            t = matrix_result[i][j] if matrix_result and matrix_result[i][j] is not None else None
-            travel_times[(i, j)] = _osrm_or_fallback_with_connection_buffer(
-                sources[i],
-                destinations[j],
-                t,
-            )
-    return travel_times
+    return _travel_times_from_matrix(sources, destinations, matrix_result, skip_diagonal=False)
 
 
 # ============================================================
@@ -1051,20 +1106,22 @@ def _build_feasibility_entry(
     """
     n = len(jobs)
     feasible: Dict[Tuple[int, int], bool] = {}
+    # Per-job bounds are hoisted out of the O(n^2) pair loop.
+    profiles = [_job_capacity_profile(job) for job in jobs]
+    arrival_min = [_entry_arrival_min(job) for job in jobs]
+    arrival_max = [_entry_arrival_max(job) for job in jobs]
+    durations = [job.duration_minutes for job in jobs]
     for i in range(n):
+        # Best case: i arrives as early as possible
+        earliest_i = arrival_min[i]
         for j in range(n):
             if i == j:
                 continue
-            if not _jobs_capacity_compatible(jobs[i], jobs[j]):
-                continue
             tt = travel_times.get((i, j), 999)
-
-            # Best case: i arrives as early as possible
-            earliest_i = _entry_arrival_min(jobs[i])
-            # Earliest possible arrival at school_j
-            earliest_j = earliest_i + tt + jobs[j].duration_minutes
-            # Must be within j's time window
-            if earliest_j <= _entry_arrival_max(jobs[j]):
+            # Earliest possible arrival at school_j must be within j's time window
+            if earliest_i + tt + durations[j] > arrival_max[j]:
+                continue
+            if _capacity_profiles_compatible(profiles[i], profiles[j]):
                 feasible[(i, j)] = True
     return feasible
 
@@ -1076,20 +1133,37 @@ def _build_feasibility_exit(
     """Build feasibility matrix for exit routes (-5/+10 min departure shift)."""
     n = len(jobs)
     feasible: Dict[Tuple[int, int], bool] = {}
+    profiles = [_job_capacity_profile(job) for job in jobs]
+    earliest_end = [_exit_departure_min(job) + job.duration_minutes for job in jobs]
+    latest_start = [_exit_departure_max(job) for job in jobs]
     for i in range(n):
         for j in range(n):
             if i == j:
                 continue
-            if not _jobs_capacity_compatible(jobs[i], jobs[j]):
-                continue
             tt = travel_times.get((i, j), 999)
-            earliest_end_i = _exit_departure_min(jobs[i]) + jobs[i].duration_minutes
-            latest_start_j = _exit_departure_max(jobs[j])
-            if earliest_end_i + tt <= latest_start_j:
+            if earliest_end[i] + tt > latest_start[j]:
+                continue
+            if _capacity_profiles_compatible(profiles[i], profiles[j]):
                 feasible[(i, j)] = True
     return feasible
 
 
+def _dense_travel_time_matrix(
+    n: int,
+    travel_times: Dict[Tuple[int, int], int],
+) -> "np.ndarray":
+    """(n, n) float matrix of ``travel_times``; absent pairs (and the diagonal) are NaN."""
+    import numpy as np
+
+    matrix = np.full((n, n), np.nan)
+    if travel_times:
+        pairs = np.array(list(travel_times.keys()), dtype=np.intp)
+        matrix[pairs[:, 0], pairs[:, 1]] = np.fromiter(
+            travel_times.values(), dtype=np.float64, count=len(travel_times)
+        )
+    return matrix
+
+
 def _compute_ml_pair_scores(
     jobs: List[RouteJob],
     travel_times: Dict[Tuple[int, int], int],
@@ -1106,6 +1180,7 @@ def _compute_ml_pair_scores(
         except ImportError:
             from backend.services.ml_assignment_service import build_ml_pair_scores
 
+        # Dense form lets the scorer build all pair features in one NumPy pass.
         return build_ml_pair_scores(
             jobs,
             travel_times,
@@ -1114,6 +1189,7 @@ def _compute_ml_pair_scores(
             max_early_arrival_minutes=int(MAX_ENTRY_SHIFT_MINUTES),
             max_exit_shift_minutes=int(MAX_EXIT_LATE_SHIFT_MINUTES),
             min_start_hour=int(MIN_START_HOUR),
+            travel_time_matrix=_dense_travel_time_matrix(len(jobs), travel_times),
         )
     except Exception as exc:
         logger.warning("ML pair scoring unavailable, using heuristic-only assignment: %s", exc)
@@ -2097,10 +2173,14 @@ def local_search_improve(
     block_jobs: Dict[int, List[RouteJob]],
     block_tt: Dict[int, Dict[Tuple[int, int], int]],
     load_balance_config: Optional[LoadBalanceConfig] = None,
+    time_limit_sec: Optional[float] = None,
 ) -> List[ChainedBus]:
     """
     Iterative local search to reduce bus count.
 
+    Runs for at most ``time_limit_sec`` seconds (LOCAL_SEARCH_TIME_LIMIT by default)
+    and returns the best bus list found so far.
+
     Strategy: try to empty buses by moving ALL their routes to other buses.
     For small buses (1-2 routes per block), try every possible insertion point.
     
@@ -2111,10 +2191,11 @@ def local_search_improve(
     start_time = time_module.time()
     initial_count = len(buses)
     improvements = 0
+    time_limit = LOCAL_SEARCH_TIME_LIMIT if time_limit_sec is None else max(0.0, float(time_limit_sec))
 
     cfg = load_balance_config or LoadBalanceConfig()
 
-    while time_module.time() - start_time < LOCAL_SEARCH_TIME_LIMIT:
+    while time_module.time() - start_time < time_limit:
         improved = False
         buses = [b for b in buses if not b.is_empty()]
         accumulation_limit = _dynamic_accumulation_limit(buses, cfg)
@@ -2133,7 +2214,7 @@ def local_search_improve(
             # This prevents accumulation of routes in a single bus
             if buses[src_idx].total_routes() >= accumulation_limit:
                 continue
-            if time_module.time() - start_time > LOCAL_SEARCH_TIME_LIMIT:
+            if time_module.time() - start_time > time_limit:
                 break
 
             src = buses[src_idx]
@@ -2861,19 +2942,19 @@ def _reverse_exit_stops(stops: List[Stop]) -> List[Stop]:
     if not stops or len(stops) < 2:
         return stops
     total_duration = max(s.time_from_start for s in stops)
-    reversed_stops: List[Stop] = []
-    for s in reversed(stops):
-        new_stop = Stop(
+    order_base = len(stops) + 1
+    return [
+        Stop(
             name=s.name,
             lat=s.lat,
             lon=s.lon,
-            order=len(stops) - s.order + 1,
+            order=order_base - s.order,
             time_from_start=total_duration - s.time_from_start,
             passengers=s.passengers,
             is_school=s.is_school
         )
-        reversed_stops.append(new_stop)
-    return reversed_stops
+        for s in reversed(stops)
+    ]
 
 
 def _make_item(
@@ -2921,6 +3002,7 @@ def optimize_v6(
     load_balance_hard_spread_limit: int = DEFAULT_LOAD_BALANCE_HARD_SPREAD_LIMIT,
     load_balance_target_band: int = DEFAULT_LOAD_BALANCE_TARGET_BAND,
     route_load_constraints: Optional[List[Dict[str, Any]]] = None,
+    time_budget_sec: Optional[float] = None,
 ) -> List[BusSchedule]:
     """
     Main optimization function for V6.
@@ -2933,12 +3015,16 @@ def optimize_v6(
         load_balance_hard_spread_limit: Max allowed spread (max-min routes per bus)
         load_balance_target_band: Band around median for target load
         route_load_constraints: Optional time windows to cap routes per bus
+        time_budget_sec: Optional wall-clock budget for the whole run. Local search
+            (the only anytime phase) stops when it is spent and keeps the best
+            solution found so far.
         
     Returns:
         List of BusSchedule objects representing the optimized fleet
     """
     
     global _LAST_OPTIMIZATION_DIAGNOSTICS
+    run_started = time_module.perf_counter()
     _reset_runtime_metrics()
     try:
         reset_router_metrics()
@@ -3080,11 +3166,17 @@ def optimize_v6(
     report_progress("local_search", 80, "Optimizando con búsqueda local...")
     print("\n[Phase 4] Local search improvement...")
     baseline_buses = deepcopy(bus_list)
+    local_search_limit: Optional[float] = None
+    if time_budget_sec is not None:
+        remaining_budget = float(time_budget_sec) - (time_module.perf_counter() - run_started)
+        local_search_limit = min(float(LOCAL_SEARCH_TIME_LIMIT), max(0.0, remaining_budget))
+        print(f"    Time budget: {local_search_limit:.1f}s left for local search")
     candidate_buses = local_search_improve(
         deepcopy(bus_list),
         blocks,
         block_tt,
         load_balance_config=load_balance_cfg,
+        time_limit_sec=local_search_limit,
     )
 
     baseline_schedules = build_full_schedule(baseline_buses, blocks, block_tt)
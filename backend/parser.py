@@ -4,6 +4,7 @@ Parser for Galician school bus route Excel files.
 
 import logging
 import re
+import sys
 import unicodedata
 from collections import Counter
 from datetime import datetime, time, timedelta
@@ -13,11 +14,21 @@ import pandas as pd
 
 from models import Route, Stop
 
+# Rust-backed reader (optional): much faster than openpyxl for .xlsx/.xls.
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 DataFrame = pd.DataFrame
 WEEKDAYS_DEFAULT = ["L", "M", "Mc", "X", "V"]
 EMPTY_TOKENS = {"", "nan", "none", "null", "nat", "<na>"}
+OPENPYXL_EXTENSIONS = (".xlsx", ".xlsm")
+# Stream cells without style objects or external links; formulas resolve to cached values.
+OPENPYXL_READ_KWARGS = {"read_only": True, "data_only": True, "keep_links": False}
 
 
 def _normalize_text(value: Any) -> str:
@@ -251,6 +262,20 @@ def parse_vehicle_capacity_range(val: Any) -> Tuple[Optional[int], Optional[int]
     return low, high, f"{low}-{high}"
 
 
+def open_excel_file(file_path: str) -> pd.ExcelFile:
+    """
+    Open an Excel workbook with the fastest available reader.
+
+    Uses python-calamine when installed; otherwise forces openpyxl
+    read-only streaming for .xlsx files.
+    """
+    if CALAMINE_AVAILABLE:
+        return pd.ExcelFile(file_path, engine="calamine")
+    if str(file_path).lower().endswith(OPENPYXL_EXTENSIONS):
+        return pd.ExcelFile(file_path, engine="openpyxl", engine_kwargs=dict(OPENPYXL_READ_KWARGS))
+    return pd.ExcelFile(file_path)
+
+
 def load_sheet(xls: pd.ExcelFile, pattern: str, with_suffix: Optional[str] = None) -> DataFrame:
     """
     Load a single sheet by name pattern.
@@ -410,7 +435,7 @@ def parse_routes_with_report(file_path: str) -> Tuple[List[Route], Dict[str, Any
     dropped_rows_counter = 0
 
     try:
-        with pd.ExcelFile(file_path) as xls:
+        with open_excel_file(file_path) as xls:
             logger.info("Parsing file: %s", file_path)
             logger.debug("Sheets found: %s", xls.sheet_names)
             report["sheets_detected"] = [str(s) for s in xls.sheet_names]
@@ -650,10 +675,11 @@ def parse_routes_with_report(file_path: str) -> Tuple[List[Route], Dict[str, Any
 
                 route_days = parse_frecuencia_semanal(row.get(frecuencia_col) if frecuencia_col else None)
 
-                school_id = info.get("school_id") or "Unknown"
-                school_name = info.get("school_name") or "Unknown"
+                # Categorical fields repeat across thousands of routes: share one string object each.
+                school_id = sys.intern(info.get("school_id") or "Unknown")
+                school_name = sys.intern(info.get("school_name") or "Unknown")
                 route_name = info.get("route_name") or route_code
-                contract_id = info.get("contract_id") or "Unknown"
+                contract_id = sys.intern(info.get("contract_id") or "Unknown")
                 cap_min, cap_max, cap_range = parse_vehicle_capacity_range(
                     row.get(vehicle_capacity_col) if vehicle_capacity_col else None
                 )
@@ -694,15 +720,15 @@ def parse_routes_with_report(file_path: str) -> Tuple[List[Route], Dict[str, Any
                         id=route_code,
                         name=info.get("route_name", route_code) or route_code,
                         stops=stops,
-                        school_id=info.get("school_id", "Unknown") or "Unknown",
-                        school_name=info.get("school_name", "Unknown") or "Unknown",
+                        school_id=sys.intern(info.get("school_id", "Unknown") or "Unknown"),
+                        school_name=sys.intern(info.get("school_name", "Unknown") or "Unknown"),
                         arrival_time=info.get("school_entry_time"),
                         departure_time=None,
                         capacity_needed=estimated_capacity if estimated_capacity > 0 else 50,
                         vehicle_capacity_min=info.get("vehicle_capacity_min"),
                         vehicle_capacity_max=info.get("vehicle_capacity_max"),
                         vehicle_capacity_range=info.get("vehicle_capacity_range"),
-                        contract_id=info.get("contract_id", "Unknown") or "Unknown",
+                        contract_id=sys.intern(info.get("contract_id", "Unknown") or "Unknown"),
                         type="entry",
                         days=WEEKDAYS_DEFAULT.copy(),
                     )
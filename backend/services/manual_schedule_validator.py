@@ -8,6 +8,7 @@ verificando que las conexiones entre rutas sean viables usando OSRM.
 import asyncio
 import time as time_module
 import logging
+from functools import lru_cache
 from typing import List, Optional, Tuple, Dict, Any
 from datetime import time, timedelta
 
@@ -24,12 +25,13 @@ class OSRMService:
         self._cache_ttl = cache_ttl_seconds
         self._cache_timestamps: Dict[str, float] = {}
         
+    @staticmethod
+    @lru_cache(maxsize=4096)
     def _get_cache_key(
-        self, 
         origin: Tuple[float, float], 
         destination: Tuple[float, float]
     ) -> str:
-        """Genera clave de cache para una conexion."""
+        """Genera clave de cache para una conexion (memoizada: es pura)."""
         return f"{origin[0]:.5f},{origin[1]:.5f}|{destination[0]:.5f},{destination[1]:.5f}"
     
     async def get_travel_time(
@@ -90,6 +92,48 @@ class OSRMService:
             # Fallback silencioso
             return self._estimate_travel_time(origin, destination)
     
+    def fetch_travel_time_matrix(
+        self,
+        points: List[Tuple[float, float]]
+    ) -> Dict[Tuple[Tuple[float, float], Tuple[float, float]], float]:
+        """
+        Obtiene los tiempos entre todos los pares de puntos con una sola
+        peticion OSRM /table (en vez de una peticion /route por conexion).
+        
+        Args:
+            points: Lista de (lat, lon)
+            
+        Returns:
+            {(origen, destino): minutos} solo para los pares que OSRM resolvio
+        """
+        try:
+            try:
+                from backend.router_service import get_travel_time_matrix
+            except ImportError:
+                from router_service import get_travel_time_matrix
+            matrix = get_travel_time_matrix(points, points)
+            # strict: una matriz con filas o columnas de menos es un error, no pares perdidos
+            return {
+                (origin, destination): float(minutes)
+                for origin, row in zip(points, matrix, strict=True)
+                for destination, minutes in zip(points, row, strict=True)
+                if minutes is not None
+            }
+        except Exception as e:
+            logger.error(f"[OSRM] Error obteniendo matriz: {e}")
+            return {}
+    
+    def preload(
+        self,
+        travel_times: Dict[Tuple[Tuple[float, float], Tuple[float, float]], float]
+    ) -> None:
+        """Carga en la cache tiempos ya conocidos, p. ej. de fetch_travel_time_matrix."""
+        now = time_module.time()
+        for (origin, destination), minutes in travel_times.items():
+            cache_key = self._get_cache_key(origin, destination)
+            self._cache[cache_key] = float(minutes)
+            self._cache_timestamps[cache_key] = now
+    
     def _estimate_travel_time(
         self, 
         origin: Tuple[float, float], 
@@ -382,27 +426,23 @@ class ManualScheduleValidator:
         if n_connections == 0:
             return 50.0
         
-        # Puntaje por buffers optimos (entre 5-15 minutos)
-        optimal_buffer_range = (5.0, 15.0)
-        buffer_scores = []
-        
-        for buffer in buffers:
-            if buffer < 0:
-                buffer_scores.append(0)  # Buffer negativo = 0 puntos
-            elif buffer < optimal_buffer_range[0]:
-                # Buffer muy corto, escala lineal 0-80
-                score = (buffer / optimal_buffer_range[0]) * 80
-                buffer_scores.append(score)
-            elif buffer <= optimal_buffer_range[1]:
-                # Buffer optimo
-                buffer_scores.append(100)
-            else:
-                # Buffer muy largo, penalizacion suave
-                excess = buffer - optimal_buffer_range[1]
-                score = max(50, 100 - excess * 2)
-                buffer_scores.append(score)
+        import numpy as np  # deferred: keeps module import cheap
+        
+        # Puntaje por buffers optimos (entre 5-15 minutos), vectorizado
+        optimal_min, optimal_max = 5.0, 15.0
+        b = np.asarray(buffers, dtype=np.float64)
+        buffer_scores = np.select(
+            [
+                b < 0,               # Buffer negativo = 0 puntos
+                b < optimal_min,     # Buffer muy corto, escala lineal 0-80
+                b <= optimal_max,    # Buffer optimo
+            ],
+            [0.0, (b / optimal_min) * 80, 100.0],
+            # Buffer muy largo, penalizacion suave
+            default=np.maximum(50.0, 100.0 - (b - optimal_max) * 2),
+        )
         
-        avg_buffer_score = sum(buffer_scores) / len(buffer_scores)
+        avg_buffer_score = float(buffer_scores.mean())
         
         # Bonus por multiples conexiones (hasta 4)
         connection_bonus = min(n_connections * 5, 20)
@@ -436,31 +476,29 @@ class ManualScheduleValidator:
         except ImportError:
             from models.validation_result import SuggestionResult
         
-        min_start = self._add_minutes(
-            current_route.end_time,
+        # Aritmetica en minutos enteros; solo se construyen objetos time al final
+        start_minutes = self._time_to_minutes(current_route.end_time) + int(
             travel_time + self.MIN_BUFFER_RECOMMENDED
         )
+        min_start = self._minutes_to_time(start_minutes)
         
         # Calcular hora de termino si tenemos duracion
         suggested_end = None
         duration = self._time_diff(next_route.start_time, next_route.end_time)
         if duration > 0:
-            suggested_end = self._add_minutes(min_start, duration)
-        
-        # Generar alternativas
-        alternatives = []
-        for extra_minutes in [0, 5, 10, 15]:
-            alt = self._add_minutes(
-                current_route.end_time,
-                travel_time + self.MIN_BUFFER_RECOMMENDED + extra_minutes
-            )
-            alternatives.append(alt)
+            suggested_end = self._minutes_to_time(start_minutes + int(duration))
+        
+        # Generar alternativas (se devuelven las 3 primeras)
+        alternatives = [
+            self._minutes_to_time(start_minutes + extra_minutes)
+            for extra_minutes in (0, 5, 10)
+        ]
         
         return SuggestionResult(
             suggested_start_time=min_start,
             suggested_end_time=suggested_end,
             message=f"Prueba iniciar esta ruta a las {min_start.strftime('%H:%M')}",
-            alternative_times=alternatives[:3]
+            alternative_times=alternatives
         )
     
     async def validate_progressive(
@@ -8,7 +8,10 @@ This module only prioritizes feasible candidate arcs to speed up search.
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Sequence, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
 
 try:
     from services.ml_assignment_service import build_ml_pair_scores
@@ -33,6 +36,7 @@ def rank_candidate_arcs(
     max_early_arrival_minutes: int = 5,
     max_exit_shift_minutes: int = 5,
     min_start_hour: int = 6,
+    travel_time_matrix: Optional["np.ndarray"] = None,
 ) -> List[ArcCandidate]:
     """
     Return feasible arcs sorted by ML score descending.
@@ -40,6 +44,7 @@ def rank_candidate_arcs(
     Notes:
     - No feasibility is relaxed here.
     - Returned arcs are only a ranking aid for the optimizer.
+    - ``travel_time_matrix`` is forwarded to ``build_ml_pair_scores``.
     """
     pair_scores = build_ml_pair_scores(
         jobs=jobs,
@@ -49,6 +54,7 @@ def rank_candidate_arcs(
         max_early_arrival_minutes=max_early_arrival_minutes,
         max_exit_shift_minutes=max_exit_shift_minutes,
         min_start_hour=min_start_hour,
+        travel_time_matrix=travel_time_matrix,
     )
 
     arcs = [
@@ -10,7 +10,19 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 import math
-from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# Feature scaling shared by the per-pair and the vectorized matrix builders.
+TRAVEL_TIME_SCALE = 60.0
+TIME_GAP_SCALE = 60.0
+BUFFER_SCALE = 30.0
+DURATION_RATIO_CAP = 3.0
+# Travel time assumed for a pair with no known travel time.
+MISSING_TRAVEL_TIME = 999
 
 
 @dataclass
@@ -85,7 +97,7 @@ class OnlineLogisticModel:
         return self._sigmoid(z)
 
 
-def _safe_ratio(a: float, b: float, cap: float = 3.0) -> float:
+def _safe_ratio(a: float, b: float, cap: float = DURATION_RATIO_CAP) -> float:
     if b <= 0:
         return 1.0
     return min(cap, a / b)
@@ -107,12 +119,12 @@ def _feature_vector(
     Scaling keeps values in compact ranges for stable SGD.
     """
     return [
-        travel_time / 60.0,
-        time_gap / 60.0,
-        buffer_minutes / 30.0,
+        travel_time / TRAVEL_TIME_SCALE,
+        time_gap / TIME_GAP_SCALE,
+        buffer_minutes / BUFFER_SCALE,
         float(same_school),
         float(route_type_match),
-        duration_ratio / 3.0,
+        duration_ratio / DURATION_RATIO_CAP,
         float(is_entry),
     ]
 
@@ -135,7 +147,7 @@ def _build_pair_rows(
             if i == j:
                 continue
 
-            tt = float(travel_times.get((i, j), 999))
+            tt = float(travel_times.get((i, j), MISSING_TRAVEL_TIME))
             a = jobs[i]
             b = jobs[j]
 
@@ -173,6 +185,84 @@ def _build_pair_rows(
     return rows
 
 
+def _build_pair_rows_matrix(
+    jobs: Sequence[Any],
+    travel_time_matrix: "np.ndarray",
+    *,
+    is_entry: bool,
+    min_buffer_minutes: float,
+    max_early_arrival_minutes: int,
+    max_exit_shift_minutes: int,
+    min_start_hour: int,
+) -> List[PairFeatureRow]:
+    """
+    Vectorized ``_build_pair_rows`` over a dense (n, n) travel-time matrix.
+
+    Computes every pair's features with NumPy broadcasting instead of one
+    dict probe and feature build per pair. NaN entries count as missing
+    (``MISSING_TRAVEL_TIME``), like absent keys in the dict form. Operations
+    and scaling constants match the scalar path, so the features are identical.
+    """
+    import numpy as np  # deferred: only the matrix path needs it
+
+    n = len(jobs)
+    if n < 2:
+        return []
+
+    tt = np.asarray(travel_time_matrix, dtype=np.float64).reshape(n, n)
+    tt = np.where(np.isnan(tt), float(MISSING_TRAVEL_TIME), tt)
+    times = np.fromiter((int(job.time_minutes) for job in jobs), dtype=np.int64, count=n)
+    durations = np.fromiter((int(job.duration_minutes) for job in jobs), dtype=np.int64, count=n)
+
+    if is_entry:
+        earliest_a = np.maximum(
+            times - int(max_early_arrival_minutes),
+            (int(min_start_hour) * 60) + durations,
+        )[:, None]
+        required_arrival_b = earliest_a + tt + durations[None, :].astype(np.float64)
+        buffer = times[None, :] - required_arrival_b
+        gap = (times[None, :] - earliest_a).astype(np.float64)
+    else:
+        earliest_end_a = ((times - int(max_exit_shift_minutes)) + durations)[:, None]
+        latest_start_b = (times + int(max_exit_shift_minutes))[None, :]
+        buffer = latest_start_b - (earliest_end_a + tt)
+        gap = (latest_start_b - earliest_end_a).astype(np.float64)
+
+    schools = np.array([getattr(job, "school_name", "") for job in jobs], dtype=object)
+    route_types = np.array([getattr(job, "route_type", "") for job in jobs], dtype=object)
+    same_school = (schools[:, None] == schools[None, :]).astype(np.float64)
+    route_type_match = (route_types[:, None] == route_types[None, :]).astype(np.float64)
+
+    dur_a = np.fromiter((float(getattr(job, "duration_minutes", 0)) for job in jobs), dtype=np.float64, count=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        duration_ratio = np.where(
+            dur_a[:, None] <= 0,
+            1.0,
+            np.minimum(DURATION_RATIO_CAP, dur_a[None, :] / dur_a[:, None]),
+        )
+
+    features = np.stack(
+        [
+            tt / TRAVEL_TIME_SCALE,
+            gap / TIME_GAP_SCALE,
+            buffer / BUFFER_SCALE,
+            same_school,
+            route_type_match,
+            duration_ratio / DURATION_RATIO_CAP,
+            np.full((n, n), 1.0 if is_entry else 0.0),
+        ],
+        axis=-1,
+    ).tolist()
+    labels = (buffer >= float(min_buffer_minutes)).tolist()
+
+    return [
+        PairFeatureRow(pair=(i, j), features=features[i][j], label=1 if labels[i][j] else 0)
+        for i in range(n)
+        for j in range(n)
+        if i != j
+    ]
+
+
 def build_ml_pair_scores(
     jobs: Sequence[Any],
     travel_times: Dict[Tuple[int, int], int],
@@ -182,15 +272,26 @@ def build_ml_pair_scores(
     max_early_arrival_minutes: int = 0,
     max_exit_shift_minutes: int = 0,
     min_start_hour: int = 6,
+    travel_time_matrix: Optional["np.ndarray"] = None,
 ) -> Dict[Tuple[int, int], float]:
     """
     Train and infer pairwise compatibility scores for assignment edges.
 
+    ``travel_time_matrix`` is an optional dense (n, n) form of
+    ``travel_times``; when given, pair features are built vectorized from it
+    and ``travel_times`` is not read.
+
     Returns probabilities in [0, 1] for each candidate pair (i, j).
     """
-    rows = _build_pair_rows(
+    build_rows = _build_pair_rows
+    travel_time_source: Any = travel_times
+    if travel_time_matrix is not None:
+        build_rows = _build_pair_rows_matrix
+        travel_time_source = travel_time_matrix
+
+    rows = build_rows(
         jobs,
-        travel_times,
+        travel_time_source,
         is_entry=is_entry,
         min_buffer_minutes=min_buffer_minutes,
         max_early_arrival_minutes=max_early_arrival_minutes,
@@ -8,13 +8,17 @@ from celery_app import celery_app
 from fastapi.encoders import jsonable_encoder
 from typing import List, Dict, Any, Callable, Optional
 from datetime import datetime
+from functools import lru_cache
 import logging
 import os
 import asyncio
+import time
+
+from sqlalchemy import delete, select, update
 
 from models import Route, BusSchedule
 from db.database import SessionLocal, is_database_available
-from db.models import OptimizationJob
+from db.models import OptimizationJob, OptimizationResultModel
 from optimizer_v6 import optimize_v6
 try:
     from services.fleet_assignment import assign_fleet_profiles_to_schedule
@@ -23,6 +27,11 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Exponential backoff (base * 2**retries), indexed by self.request.retries.
+# The last entry covers the call that exceeds max_retries.
+_RETRY_COUNTDOWNS = (60, 120, 240, 480)  # optimize_task / optimize_advanced_task
+_PIPELINE_RETRY_COUNTDOWNS = (30, 60, 120)  # optimize_pipeline_task
+
 # Import config if available
 try:
     from config import config
@@ -34,35 +43,44 @@ except ImportError:
 def _create_progress_callback(
     celery_task, 
     job_id: str,
-    update_interval: float = 1.0
+    update_interval: float = 1.0,
+    clock: Callable[[], float] = time.monotonic,
+    min_progress_step: int = 5,
 ) -> Callable:
     """
     Create a progress callback function that updates Celery state and Redis.
     
+    Every admitted update is a result-backend write plus a Redis publish, so
+    ticks within a phase are coalesced: one is sent only once
+    ``update_interval`` has elapsed *and* progress moved by at least
+    ``min_progress_step``. Phase changes and the 0%/100% boundaries are
+    always sent.
+    
     Args:
         celery_task: The Celery task instance (self)
         job_id: The job ID for tracking
-        update_interval: Minimum seconds between updates
+        update_interval: Minimum seconds between updates within a phase
+        clock: Source of the current time in seconds (injectable for tests)
+        min_progress_step: Minimum progress delta between updates within a phase
         
     Returns:
         Callback function for optimizer_v6
     """
     last_update_time = [0.0]  # Use list for mutable closure
     last_progress = [0]  # Track last progress to avoid duplicate updates
+    last_phase = [None]
     
     def callback(phase: str, progress: int, message: str):
-        import time
+        current_time = clock()
         
-        current_time = time.time()
-        
-        # Skip if progress hasn't changed significantly and interval hasn't passed
-        if (progress - last_progress[0] < 5 and 
-            current_time - last_update_time[0] < update_interval and
-            progress not in [0, 100]):  # Always send 0% and 100%
-            return
+        if phase == last_phase[0] and progress not in (0, 100):  # Always send 0% and 100%
+            if (current_time - last_update_time[0] < update_interval or
+                    progress - last_progress[0] < min_progress_step):
+                return
         
         last_update_time[0] = current_time
         last_progress[0] = progress
+        last_phase[0] = phase
         
         # Update Celery task state
         try:
@@ -88,6 +106,30 @@ def _create_progress_callback(
     return callback
 
 
+@lru_cache(maxsize=1)
+def _get_redis_client():
+    """
+    Shared Redis client for progress publishing.
+
+    Built on first use and reused so each publish draws from the client's
+    connection pool instead of opening a new TCP connection.
+    """
+    import redis
+    from config import config
+
+    return redis.Redis.from_url(config.REDIS_URL)
+
+
+def _drop_redis_client_on_connection_error(exc: Exception) -> None:
+    """Forget the cached client after a connection error so the next call reconnects."""
+    try:
+        import redis
+    except ImportError:
+        return
+    if isinstance(exc, redis.ConnectionError):
+        _get_redis_client.cache_clear()
+
+
 def _publish_to_redis(job_id: str, phase: str, progress: int, message: str) -> bool:
     """
     Publish progress update to Redis for WebSocket distribution.
@@ -102,7 +144,6 @@ def _publish_to_redis(job_id: str, phase: str, progress: int, message: str) -> b
         True if published successfully
     """
     try:
-        import redis
         import json
         
         from config import config
@@ -110,7 +151,7 @@ def _publish_to_redis(job_id: str, phase: str, progress: int, message: str) -> b
         if not config.is_redis_available():
             return False
         
-        client = redis.Redis.from_url(config.REDIS_URL)
+        client = _get_redis_client()
         
         data = {
             "job_id": job_id,
@@ -121,16 +162,20 @@ def _publish_to_redis(job_id: str, phase: str, progress: int, message: str) -> b
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        # Publish to channel specific to this job
-        client.publish(f"job_progress:{job_id}", json.dumps(jsonable_encoder(data), ensure_ascii=False))
+        payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
         
-        # Also publish to general progress channel
-        client.publish("job_progress:all", json.dumps(jsonable_encoder(data), ensure_ascii=False))
+        # Publish to the job channel and the general progress channel in a
+        # single round trip
+        pipe = client.pipeline()
+        pipe.publish(f"job_progress:{job_id}", payload)
+        pipe.publish("job_progress:all", payload)
+        pipe.execute()
         
         return True
         
     except Exception as e:
         logger.debug(f"Redis publish error: {e}")
+        _drop_redis_client_on_connection_error(e)
         return False
 
 
@@ -139,26 +184,45 @@ def _publish_dict_to_redis(job_id: str, data: Dict[str, Any]) -> bool:
     Publica un payload arbitrario en el canal del job.
     """
     try:
-        import redis
         import json
         from config import config
 
         if not config.is_redis_available():
             return False
 
-        client = redis.Redis.from_url(config.REDIS_URL)
+        client = _get_redis_client()
         payload = dict(data)
         payload["job_id"] = job_id
         payload.setdefault("timestamp", datetime.utcnow().isoformat())
-        safe_payload = jsonable_encoder(payload)
-        client.publish(f"job_progress:{job_id}", json.dumps(safe_payload, ensure_ascii=False))
-        client.publish("job_progress:all", json.dumps(safe_payload, ensure_ascii=False))
+        message = json.dumps(jsonable_encoder(payload), ensure_ascii=False)
+        pipe = client.pipeline()
+        pipe.publish(f"job_progress:{job_id}", message)
+        pipe.publish("job_progress:all", message)
+        pipe.execute()
         return True
     except Exception as e:
         logger.debug(f"Redis publish payload error: {e}")
+        _drop_redis_client_on_connection_error(e)
         return False
 
 
+def _update_job(db, job_id: str, **values: Any) -> bool:
+    """
+    Apply a job state transition in a single UPDATE and commit it.
+    
+    Replaces the SELECT-then-mutate round trip. Returns False when no job
+    with ``job_id`` exists.
+    """
+    updated = db.execute(
+        update(OptimizationJob)
+        .where(OptimizationJob.id == job_id)
+        .values(**values)
+        .returning(OptimizationJob.id)
+    ).first()
+    db.commit()
+    return updated is not None
+
+
 @celery_app.task(bind=True, max_retries=3)
 def optimize_task(
     self,
@@ -177,7 +241,6 @@ def optimize_task(
         dict: Resultado de la optimización
     """
     db = None
-    job = None
     
     # Create progress callback
     progress_callback = _create_progress_callback(self, job_id)
@@ -190,11 +253,12 @@ def optimize_task(
         if is_database_available():
             try:
                 db = SessionLocal()
-                job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
-                if job:
-                    job.status = "running"
-                    job.started_at = datetime.utcnow()
-                    db.commit()
+                _update_job(
+                    db,
+                    job_id,
+                    status="running",
+                    started_at=datetime.utcnow(),
+                )
             except Exception as e:
                 logger.warning(f"Could not update job status in database: {e}")
         
@@ -232,13 +296,14 @@ def optimize_task(
         if is_database_available():
             try:
                 db = SessionLocal() if db is None else db
-                job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
-                if job:
-                    job.status = "completed"
-                    job.result = jsonable_encoder(result)
-                    job.stats = jsonable_encoder(stats)
-                    job.completed_at = datetime.utcnow()
-                    db.commit()
+                _update_job(
+                    db,
+                    job_id,
+                    status="completed",
+                    result=jsonable_encoder(result),
+                    stats=jsonable_encoder(stats),
+                    completed_at=datetime.utcnow(),
+                )
             except Exception as e:
                 logger.warning(f"Could not update job result in database: {e}")
         
@@ -258,10 +323,9 @@ def optimize_task(
         try:
             import json
             from config import config
-            import redis
             
             if config.is_redis_available():
-                client = redis.Redis.from_url(config.REDIS_URL)
+                client = _get_redis_client()
                 error_data = {
                     "job_id": job_id,
                     "type": "error",
@@ -280,17 +344,18 @@ def optimize_task(
         if is_database_available():
             try:
                 db = SessionLocal() if db is None else db
-                job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
-                if job:
-                    job.status = "failed"
-                    job.error_message = error_message
-                    db.commit()
+                _update_job(
+                    db,
+                    job_id,
+                    status="failed",
+                    error_message=error_message,
+                )
             except Exception as e:
                 logger.warning(f"Could not update job error status: {e}")
         
         # Retry automático con backoff
         retry_count = self.request.retries
-        countdown = 60 * (2 ** retry_count)  # 60s, 120s, 240s
+        countdown = _RETRY_COUNTDOWNS[min(retry_count, len(_RETRY_COUNTDOWNS) - 1)]
         
         logger.info(f"[Celery] Retrying job {job_id} in {countdown}s (attempt {retry_count + 1}/3)")
         raise self.retry(exc=exc, countdown=countdown)
@@ -315,26 +380,40 @@ def _calculate_stats(schedule: List[BusSchedule]) -> Dict[str, Any]:
             "total_early_shift_minutes": 0,
         }
     
-    total_routes = sum(len(bus.items) for bus in schedule)
-    entry_counts = [sum(1 for i in bus.items if i.type == "entry") for bus in schedule]
-    exit_counts = [sum(1 for i in bus.items if i.type == "exit") for bus in schedule]
-    max_entries = max(entry_counts) if entry_counts else 0
-    max_exits = max(exit_counts) if exit_counts else 0
-    buses_with_both = sum(1 for i, e in enumerate(entry_counts) if e > 0 and exit_counts[i] > 0)
-    total_early_shift = sum(
-        item.time_shift_minutes for bus in schedule for item in bus.items
-        if item.time_shift_minutes > 0
-    )
+    # Single pass over every bus/item, accumulating all counters at once
+    total_routes = 0
+    total_entries = 0
+    total_exits = 0
+    max_entries = 0
+    max_exits = 0
+    buses_with_both = 0
+    total_early_shift = 0
+    for bus in schedule:
+        entries = exits = 0
+        for item in bus.items:
+            if item.type == "entry":
+                entries += 1
+            elif item.type == "exit":
+                exits += 1
+            if item.time_shift_minutes > 0:
+                total_early_shift += item.time_shift_minutes
+        total_routes += len(bus.items)
+        total_entries += entries
+        total_exits += exits
+        max_entries = max(max_entries, entries)
+        max_exits = max(max_exits, exits)
+        if entries and exits:
+            buses_with_both += 1
     
     return {
         "total_buses": len(schedule),
         "total_routes": total_routes,
-        "total_entries": sum(entry_counts),
-        "total_exits": sum(exit_counts),
+        "total_entries": total_entries,
+        "total_exits": total_exits,
         "max_entries_per_bus": max_entries,
         "max_exits_per_bus": max_exits,
         "buses_with_both": buses_with_both,
-        "avg_routes_per_bus": round(total_routes / len(schedule), 1) if schedule else 0,
+        "avg_routes_per_bus": round(total_routes / len(schedule), 1),
         "total_early_shift_minutes": total_early_shift,
     }
 
@@ -375,11 +454,12 @@ def optimize_advanced_task(
         if is_database_available():
             try:
                 db = SessionLocal()
-                job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
-                if job:
-                    job.status = "running"
-                    job.started_at = datetime.utcnow()
-                    db.commit()
+                _update_job(
+                    db,
+                    job_id,
+                    status="running",
+                    started_at=datetime.utcnow(),
+                )
             except Exception as e:
                 logger.warning(f"Could not update job status in database: {e}")
         
@@ -450,13 +530,14 @@ def optimize_advanced_task(
         if is_database_available():
             try:
                 db = SessionLocal() if db is None else db
-                job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
-                if job:
-                    job.status = "completed"
-                    job.result = jsonable_encoder(result)
-                    job.stats = jsonable_encoder(stats)
-                    job.completed_at = datetime.utcnow()
-                    db.commit()
+                _update_job(
+                    db,
+                    job_id,
+                    status="completed",
+                    result=jsonable_encoder(result),
+                    stats=jsonable_encoder(stats),
+                    completed_at=datetime.utcnow(),
+                )
             except Exception as e:
                 logger.warning(f"Could not update job result in database: {e}")
         
@@ -476,10 +557,9 @@ def optimize_advanced_task(
         try:
             import json
             from config import config
-            import redis
             
             if config.is_redis_available():
-                client = redis.Redis.from_url(config.REDIS_URL)
+                client = _get_redis_client()
                 error_data = {
                     "job_id": job_id,
                     "type": "error",
@@ -498,17 +578,18 @@ def optimize_advanced_task(
         if is_database_available():
             try:
                 db = SessionLocal() if db is None else db
-                job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
-                if job:
-                    job.status = "failed"
-                    job.error_message = error_message
-                    db.commit()
+                _update_job(
+                    db,
+                    job_id,
+                    status="failed",
+                    error_message=error_message,
+                )
             except Exception as e:
                 logger.warning(f"Could not update job error status: {e}")
         
         # Retry automático con backoff
         retry_count = self.request.retries
-        countdown = 60 * (2 ** retry_count)  # 60s, 120s, 240s
+        countdown = _RETRY_COUNTDOWNS[min(retry_count, len(_RETRY_COUNTDOWNS) - 1)]
         
         logger.info(f"[Celery-Advanced] Retrying job {job_id} in {countdown}s (attempt {retry_count + 1}/3)")
         raise self.retry(exc=exc, countdown=countdown)
@@ -578,11 +659,12 @@ def optimize_pipeline_task(
         if is_database_available():
             try:
                 db = SessionLocal()
-                job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
-                if job:
-                    job.status = "running"
-                    job.started_at = datetime.utcnow()
-                    db.commit()
+                _update_job(
+                    db,
+                    job_id,
+                    status="running",
+                    started_at=datetime.utcnow(),
+                )
             except Exception as e:
                 logger.warning(f"[Pipeline] Could not mark job running: {e}")
 
@@ -600,13 +682,14 @@ def optimize_pipeline_task(
         if is_database_available():
             try:
                 db = SessionLocal() if db is None else db
-                job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
-                if job:
-                    job.status = "completed"
-                    job.result = jsonable_encoder(result)
-                    job.stats = jsonable_encoder(result.get("summary_metrics"))
-                    job.completed_at = datetime.utcnow()
-                    db.commit()
+                _update_job(
+                    db,
+                    job_id,
+                    status="completed",
+                    result=jsonable_encoder(result),
+                    stats=jsonable_encoder(result.get("summary_metrics")),
+                    completed_at=datetime.utcnow(),
+                )
             except Exception as e:
                 logger.warning(f"[Pipeline] Could not persist job result: {e}")
 
@@ -635,16 +718,17 @@ def optimize_pipeline_task(
         if is_database_available():
             try:
                 db = SessionLocal() if db is None else db
-                job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
-                if job:
-                    job.status = "failed"
-                    job.error_message = f"{current_stage}: {error_message}"
-                    db.commit()
+                _update_job(
+                    db,
+                    job_id,
+                    status="failed",
+                    error_message=f"{current_stage}: {error_message}",
+                )
             except Exception as e:
                 logger.warning(f"[Pipeline] Could not mark job failed: {e}")
 
         retry_count = self.request.retries
-        countdown = 30 * (2 ** retry_count)
+        countdown = _PIPELINE_RETRY_COUNTDOWNS[min(retry_count, len(_PIPELINE_RETRY_COUNTDOWNS) - 1)]
         raise self.retry(exc=exc, countdown=countdown)
     finally:
         if db:
@@ -671,17 +755,25 @@ def cleanup_old_jobs(max_age_hours: int = 24) -> Dict[str, Any]:
     try:
         cutoff_time = datetime.utcnow() - timedelta(hours=max_age_hours)
         
-        # Find old completed/failed jobs
-        old_jobs = db.query(OptimizationJob).filter(
+        # Old completed/failed jobs, deleted set-wise instead of loading
+        # every row and issuing one DELETE per job.
+        old_job_ids = select(OptimizationJob.id).where(
             OptimizationJob.status.in_(["completed", "failed", "cancelled"]),
             OptimizationJob.created_at < cutoff_time
-        ).all()
-        
-        count = len(old_jobs)
+        )
         
-        # Delete them
-        for job in old_jobs:
-            db.delete(job)
+        # Bulk deletes skip the ORM cascade (and SQLite does not enforce
+        # ON DELETE CASCADE by default), so drop the results first.
+        db.execute(
+            delete(OptimizationResultModel)
+            .where(OptimizationResultModel.job_id.in_(old_job_ids))
+            .execution_options(synchronize_session=False)
+        )
+        count = db.execute(
+            delete(OptimizationJob)
+            .where(OptimizationJob.id.in_(old_job_ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
         
         db.commit()
         
@@ -2,10 +2,16 @@
 import sys
 import os
 import time
+import hashlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 sys.path.insert(0, os.path.dirname(__file__))
 
-from parser import parse_routes
+from pydantic import TypeAdapter
+
+# Importing models (not parser) keeps pandas off the cache-hit path.
+from models import Route
 
 # Parse all Excel files
 files = [
@@ -16,70 +22,142 @@ files = [
     r'C:\Users\Juanjo\Desktop\ODINX LABS\UE3622 VIGO (1).xlsx',
 ]
 
-print("=" * 60)
-print("PARSING INPUT FILES")
-print("=" * 60)
-
-all_routes = []
-for f in files:
-    routes = parse_routes(f)
-    print(f"  {os.path.basename(f)}: {len(routes)} routes")
-    all_routes.extend(routes)
-
-print(f"\nTotal routes: {len(all_routes)}")
-entries = sum(1 for r in all_routes if r.type == "entry")
-exits = sum(1 for r in all_routes if r.type == "exit")
-print(f"  Entries: {entries}, Exits: {exits}")
-
-# Test V5
-print("\n" + "=" * 60)
-print("RUNNING V5 OPTIMIZER")
-print("=" * 60)
-from optimizer_v5 import optimize_v5
-start = time.time()
-v5_result = optimize_v5(all_routes)
-v5_time = time.time() - start
-v5_buses = len(v5_result)
-v5_routes = sum(len(b.items) for b in v5_result)
-print(f"\nV5: {v5_buses} buses, {v5_routes} routes in {v5_time:.1f}s")
-
-# Test V6
-print("\n" + "=" * 60)
-print("RUNNING V6 OPTIMIZER")
-print("=" * 60)
-from optimizer_v6 import optimize_v6
-start = time.time()
-v6_result = optimize_v6(all_routes)
-v6_time = time.time() - start
-v6_buses = len(v6_result)
-v6_routes = sum(len(b.items) for b in v6_result)
-print(f"\nV6: {v6_buses} buses, {v6_routes} routes in {v6_time:.1f}s")
-
-# Comparison
-print("\n" + "=" * 60)
-print("COMPARISON")
-print("=" * 60)
-print(f"  V5: {v5_buses} buses ({v5_routes} routes) in {v5_time:.1f}s")
-print(f"  V6: {v6_buses} buses ({v6_routes} routes) in {v6_time:.1f}s")
-diff = v5_buses - v6_buses
-if diff > 0:
-    print(f"  V6 saves {diff} buses ({diff/v5_buses*100:.1f}% reduction)")
-elif diff < 0:
-    print(f"  V5 is better by {-diff} buses")
-else:
-    print(f"  Same bus count")
-
-# Verify all routes assigned
-v6_route_ids = set()
-for bus in v6_result:
-    for item in bus.items:
-        v6_route_ids.add(item.route_id)
-
-input_route_ids = set(r.id for r in all_routes)
-missing = input_route_ids - v6_route_ids
-if missing:
-    print(f"\n  WARNING: {len(missing)} routes not assigned in V6!")
-    for rid in list(missing)[:5]:
-        print(f"    - {rid}")
-else:
-    print(f"\n  All {len(input_route_ids)} routes assigned in V6")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+# pydantic-core encodes/decodes the route list in Rust, without pickle's
+# per-object __reduce__ round trips.
+ROUTES_ADAPTER = TypeAdapter(list[Route])
+
+
+# Source files whose changes invalidate cached routes (parser output shape).
+_CACHE_CODE_FILES = ("parser.py", "models.py")
+
+
+def _code_version():
+    """Hash of the parser and model sources, so a code change misses the cache."""
+    digest = hashlib.blake2b(digest_size=16)
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in _CACHE_CODE_FILES:
+        with open(os.path.join(base, name), "rb") as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()
+
+
+def _routes_cache_path(paths):
+    """Cache file keyed by parser/model sources and (path, mtime, size) of every workbook."""
+    fingerprint = repr((
+        _code_version(),
+        [(p, os.path.getmtime(p), os.path.getsize(p)) for p in paths],
+    ))
+    key = hashlib.blake2b(fingerprint.encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, f"routes_{key}.json")
+
+
+def load_all_routes(paths):
+    """Parse input workbooks, reusing a cached result when inputs are unchanged."""
+    cache_path = _routes_cache_path(paths)
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as fh:
+            all_routes = ROUTES_ADAPTER.validate_json(fh.read())
+        print(f"  Loaded {len(all_routes)} routes from cache: {cache_path}")
+        return all_routes
+
+    from parser import parse_routes
+
+    # Each workbook is parsed in its own process: openpyxl parsing is CPU-bound.
+    all_routes = []
+    with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as executor:
+        results = list(executor.map(parse_routes, paths))
+    for f, routes in zip(paths, results, strict=True):
+        print(f"  {os.path.basename(f)}: {len(routes)} routes")
+        all_routes.extend(routes)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_path, "wb") as fh:
+        fh.write(ROUTES_ADAPTER.dump_json(all_routes))
+    return all_routes
+
+
+def run_v5(routes):
+    """Run V5 in a worker process; returns (schedule, elapsed seconds)."""
+    from optimizer_v5 import optimize_v5
+    start = time.perf_counter()
+    result = optimize_v5(routes)
+    return result, time.perf_counter() - start
+
+
+def run_v6(routes, time_budget_sec=None):
+    """Run V6 in a worker process; returns (schedule, elapsed seconds)."""
+    from optimizer_v6 import optimize_v6
+    start = time.perf_counter()
+    result = optimize_v6(routes, time_budget_sec=time_budget_sec)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print("=" * 60)
+    print("PARSING INPUT FILES")
+    print("=" * 60)
+
+    all_routes = load_all_routes(files)
+
+    print(f"\nTotal routes: {len(all_routes)}")
+    type_counts = Counter(r.type for r in all_routes)
+    entries, exits = type_counts["entry"], type_counts["exit"]
+    print(f"  Entries: {entries}, Exits: {exits}")
+
+    # V5 is only needed for the comparison; RUN_V5=0 skips it while iterating on V6.
+    run_v5_enabled = os.environ.get("RUN_V5", "1") == "1"
+    # Optional cap on V6 wall time (e.g. V6_TIME_BUDGET_SEC=60) for quick comparisons.
+    v6_budget = os.environ.get("V6_TIME_BUDGET_SEC")
+    v6_budget = float(v6_budget) if v6_budget else None
+
+    print("\n" + "=" * 60)
+    print("RUNNING V5 AND V6 OPTIMIZERS" if run_v5_enabled else "RUNNING V6 OPTIMIZER")
+    print("=" * 60)
+    if run_v5_enabled:
+        # V5 and V6 are independent CPU-bound runs: execute them side by side.
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            v5_future = executor.submit(run_v5, all_routes)
+            v6_future = executor.submit(run_v6, all_routes, v6_budget)
+            v5_result, v5_time = v5_future.result()
+            v6_result, v6_time = v6_future.result()
+        v5_buses = len(v5_result)
+        v5_routes = sum(len(b.items) for b in v5_result)
+        print(f"\nV5: {v5_buses} buses, {v5_routes} routes in {v5_time:.1f}s")
+    else:
+        v6_result, v6_time = run_v6(all_routes, v6_budget)
+        v5_buses, v5_routes, v5_time = None, None, None
+
+    v6_buses = len(v6_result)
+    v6_routes = sum(len(b.items) for b in v6_result)
+    print(f"V6: {v6_buses} buses, {v6_routes} routes in {v6_time:.1f}s")
+
+    # Comparison
+    if v5_buses is not None:
+        print("\n" + "=" * 60)
+        print("COMPARISON")
+        print("=" * 60)
+        print(f"  V5: {v5_buses} buses ({v5_routes} routes) in {v5_time:.1f}s")
+        print(f"  V6: {v6_buses} buses ({v6_routes} routes) in {v6_time:.1f}s")
+        diff = v5_buses - v6_buses
+        if diff > 0:
+            print(f"  V6 saves {diff} buses ({diff/v5_buses*100:.1f}% reduction)")
+        elif diff < 0:
+            print(f"  V5 is better by {-diff} buses")
+        else:
+            print(f"  Same bus count")
+
+    # Verify all routes assigned
+    v6_route_ids = {item.route_id for bus in v6_result for item in bus.items}
+    input_route_ids = {r.id for r in all_routes}
+    missing = input_route_ids.difference(v6_route_ids)
+    if missing:
+        print(f"\n  WARNING: {len(missing)} routes not assigned in V6!")
+        for rid in list(missing)[:5]:
+            print(f"    - {rid}")
+    else:
+        print(f"\n  All {len(input_route_ids)} routes assigned in V6")
+
+
+if __name__ == "__main__":
+    main()
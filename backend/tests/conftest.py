@@ -2,9 +2,12 @@
 Pytest configuration and shared fixtures for Tutti backend tests.
 """
 import pytest
+import importlib
 import json
 import os
+import shutil
 import sys
+import tempfile
 from datetime import time
 from typing import List
 
@@ -17,8 +20,10 @@ from models import Stop, Route, BusSchedule, ScheduleItem, Bus
 # ============================================================
 # FIXTURES FOR STOPS
 # ============================================================
+# Immutable model fixtures are module/session scoped so they are built once.
+# Tests that need to mutate one must copy it first (``copy.deepcopy``).
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_stop() -> Stop:
     """Create a basic stop fixture."""
     return Stop(
@@ -32,7 +37,7 @@ def sample_stop() -> Stop:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def school_stop() -> Stop:
     """Create a school stop fixture."""
     return Stop(
@@ -46,7 +51,7 @@ def school_stop() -> Stop:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def multiple_stops() -> List[Stop]:
     """Create a list of stops for a route."""
     return [
@@ -61,7 +66,7 @@ def multiple_stops() -> List[Stop]:
 # FIXTURES FOR ROUTES
 # ============================================================
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def entry_route(multiple_stops) -> Route:
     """Create an entry route fixture (morning pickup)."""
     return Route(
@@ -79,7 +84,7 @@ def entry_route(multiple_stops) -> Route:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def exit_route(multiple_stops) -> Route:
     """Create an exit route fixture (afternoon dropoff)."""
     return Route(
@@ -97,7 +102,7 @@ def exit_route(multiple_stops) -> Route:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def multiple_entry_routes() -> List[Route]:
     """Create multiple entry routes for testing optimizer."""
     routes = []
@@ -131,7 +136,7 @@ def multiple_entry_routes() -> List[Route]:
     return routes
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def multiple_exit_routes() -> List[Route]:
     """Create multiple exit routes for testing optimizer."""
     routes = []
@@ -164,13 +169,13 @@ def multiple_exit_routes() -> List[Route]:
     return routes
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mixed_routes(multiple_entry_routes, multiple_exit_routes) -> List[Route]:
     """Create mixed entry and exit routes."""
     return multiple_entry_routes + multiple_exit_routes
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def optimizer_test_routes() -> List[Route]:
     """
     Create 15 routes suitable for optimizer testing.
@@ -244,7 +249,7 @@ def optimizer_test_routes() -> List[Route]:
 # FIXTURES FOR BUSES AND SCHEDULES
 # ============================================================
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_bus() -> Bus:
     """Create a bus fixture."""
     return Bus(
@@ -254,7 +259,7 @@ def sample_bus() -> Bus:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_schedule_item(entry_route) -> ScheduleItem:
     """Create a schedule item fixture."""
     return ScheduleItem(
@@ -271,7 +276,7 @@ def sample_schedule_item(entry_route) -> ScheduleItem:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_bus_schedule(sample_schedule_item) -> BusSchedule:
     """Create a bus schedule fixture."""
     return BusSchedule(
@@ -285,39 +290,203 @@ def sample_bus_schedule(sample_schedule_item) -> BusSchedule:
 # FIXTURES FOR FILE PATHS
 # ============================================================
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def fixtures_dir() -> str:
     """Return the path to the fixtures directory."""
     return os.path.join(os.path.dirname(__file__), "fixtures")
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_json_path(fixtures_dir) -> str:
     """Return the path to the sample routes JSON file."""
     return os.path.join(fixtures_dir, "sample_routes.json")
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_excel_path(fixtures_dir) -> str:
     """Return the path to the sample Excel file."""
     return os.path.join(fixtures_dir, "sample_excel.xlsx")
 
 
+# ============================================================
+# FIXTURES FOR API
+# ============================================================
+
+@pytest.fixture(scope="session")
+def client():
+    """
+    Create a test client for the FastAPI app, shared by the whole session.
+
+    Per-test state (database, Celery flags) is patched onto ``main`` by
+    function-scoped fixtures instead of rebuilding the app.
+    """
+    try:
+        from fastapi.testclient import TestClient
+        from main import app
+    except ImportError:
+        pytest.skip("Main app not available")
+    return TestClient(app)
+
+
+@pytest.fixture
+async def async_client():
+    """
+    In-process ``httpx.AsyncClient`` for the FastAPI app.
+
+    Requests run on the session event loop through ``ASGITransport``,
+    without TestClient's thread bridge. Like ``client``, the app lifespan
+    is not started.
+    """
+    try:
+        import httpx
+        from main import app
+    except ImportError:
+        pytest.skip("Main app not available")
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac
+
+
+# ============================================================
+# FIXTURES FOR DATABASE
+# ============================================================
+
+@pytest.fixture(scope="session")
+def db_engine():
+    """
+    In-memory SQLite engine with the full schema, shared by the session.
+
+    StaticPool keeps a single connection, so every session (test or API)
+    sees the same in-memory database. Each pytest-xdist worker is its own
+    process and builds its own engine, so DB tests parallelize under
+    ``pytest -n auto`` without an ``xdist_group`` marker.
+    """
+    try:
+        from sqlalchemy import create_engine, event
+        from sqlalchemy.pool import StaticPool
+        from db.models import Base
+    except ImportError:
+        pytest.skip("Database not available")
+
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        pool_reset_on_return=None,
+    )
+
+    # pysqlite defers BEGIN on its own, which breaks SAVEPOINT handling;
+    # let SQLAlchemy emit BEGIN so nested transactions roll back correctly.
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine, monkeypatch):
+    """
+    Create a database session whose changes are rolled back on teardown.
+
+    The test session and the API's ``SessionLocal`` share one connection
+    inside an outer transaction; their ``commit()`` calls only release
+    SAVEPOINTs, so rows written during the test never need a DELETE.
+    """
+    from sqlalchemy.orm import Session, sessionmaker
+
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+
+    app_session_factory = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=connection,
+        join_transaction_mode="create_savepoint",
+    )
+    # The availability probe would open a second handle on the single
+    # StaticPool connection mid-transaction, so report the test DB directly.
+    for module_name in ("db.database", "main"):
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        monkeypatch.setattr(module, "SessionLocal", app_session_factory)
+        monkeypatch.setattr(module, "is_database_available", lambda: True)
+
+    yield session
+
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
 # ============================================================
 # FIXTURES FOR ASYNC TESTING (CELERY + WEBSOCKET)
 # ============================================================
 
+def _xdist_worker_index() -> int:
+    """Index of the current pytest-xdist worker ("gw3" -> 3), 0 when not distributed."""
+    worker_id = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    return int(worker_id.lstrip("gw") or 0)
+
+
 @pytest.fixture(scope="session")
 def celery_config():
     """Configure Celery for testing."""
+    # Use a different Redis DB for tests, one per xdist worker (gw0 -> 1, gw1 -> 2, ...).
+    # Redis ships with DBs 0-15 and 0 is left alone, so workers past gw14 wrap to 1.
+    redis_url = f"redis://localhost:6379/{1 + _xdist_worker_index() % 15}"
     return {
-        "broker_url": "redis://localhost:6379/1",  # Use different DB for tests
-        "result_backend": "redis://localhost:6379/1",
+        "broker_url": redis_url,
+        "result_backend": redis_url,
         "task_always_eager": True,  # Execute tasks synchronously in tests
         "task_store_eager_result": True,
     }
 
 
+@pytest.fixture(scope="session")
+def celery_available() -> bool:
+    """
+    Probe once per session whether a Celery worker is reachable.
+
+    A refused Redis connection is detected immediately, so the slower
+    broker ping (with its connection retries) only runs when Redis is up.
+    """
+    try:
+        from config import config
+        from celery_app import celery_app
+    except ImportError:
+        return False
+    if not config.is_redis_available():
+        return False
+    try:
+        return bool(celery_app.control.ping(timeout=0.1))
+    except Exception:
+        return False
+
+
+@pytest.fixture
+def celery_mode(celery_available, monkeypatch):
+    """
+    Only route API requests through Celery when a worker answered the probe.
+    
+    Otherwise every enqueue, revoke or health ping would wait out the
+    broker connection retries before the endpoint falls back.
+    """
+    import main
+    
+    monkeypatch.setattr(main, "CELERY_ENABLED", main.CELERY_ENABLED and celery_available)
+
+
 @pytest.fixture
 def celery_worker():
     """Configure Celery app for eager execution in tests."""
@@ -481,9 +650,51 @@ def mock_websocket():
 # TEST CONFIGURATION
 # ============================================================
 
+SHM_DIR = "/dev/shm"
+
+
 def pytest_configure(config):
-    """Configure pytest with custom markers."""
+    """Configure pytest with custom markers and a RAM-backed tmp_path root."""
     config.addinivalue_line("markers", "slow: marks tests as slow (deselect with '-m \"not slow\"')")
     config.addinivalue_line("markers", "integration: marks tests as integration tests")
     config.addinivalue_line("markers", "optimizer: marks tests as optimizer tests")
     config.addinivalue_line("markers", "async_test: marks tests as async tests requiring special setup")
+
+    # Files written under tmp_path (benchmark results, reports) skip the disk
+    # when tmpfs is available. An explicit --basetemp wins, and xdist workers
+    # inherit the controller's basetemp.
+    if (
+        config.option.basetemp is None
+        and "PYTEST_XDIST_WORKER" not in os.environ
+        and os.path.isdir(SHM_DIR)
+        and os.access(SHM_DIR, os.W_OK)
+    ):
+        config.option.basetemp = tempfile.mkdtemp(prefix="tutti-pytest-", dir=SHM_DIR)
+        config._tutti_shm_basetemp = config.option.basetemp
+
+
+def pytest_unconfigure(config):
+    """Release the tmpfs basetemp created in pytest_configure."""
+    basetemp = getattr(config, "_tutti_shm_basetemp", None)
+    if basetemp:
+        shutil.rmtree(basetemp, ignore_errors=True)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _isolated_osrm_cache_file(tmp_path_factory):
+    """
+    Point router_service's on-disk OSRM cache at a temporary file.
+
+    ``save_cache()`` otherwise writes ``osrm_cache.json`` into the working
+    directory whenever an optimizer or API test runs.
+    """
+    try:
+        import router_service
+    except ImportError:
+        yield
+        return
+    cache_file = tmp_path_factory.mktemp("osrm") / "osrm_cache.json"
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(router_service, "CACHE_FILE_PATH", cache_file)
+        mp.setattr(router_service, "CACHE_FILE", str(cache_file))
+        yield
@@ -2,9 +2,10 @@
 Generate a sample Excel file for parser testing.
 Run this script to create sample_excel.xlsx
 """
-import pandas as pd
 import os
 
+from openpyxl import Workbook
+
 # Create data for I. Rutas sheet
 rutas_data = {
     'Código Ruta': ['R001', 'R002', 'R003', 'R004', 'R005'],
@@ -50,15 +51,25 @@ expedicions_data = {
     'Frecuencia Semanal': ['LMMcXV', 'LMMcXV', 'LMXV', 'LMMcXV', 'LMMcXV', 'McXV']
 }
 
+def _write_sheet(wb, sheet_name, data):
+    """Write a column-oriented dict as a header row plus data rows."""
+    ws = wb.create_sheet(sheet_name)
+    ws.append(list(data.keys()))
+    for row in zip(*data.values(), strict=True):
+        ws.append(row)
+
+
 def create_sample_excel():
     """Create the sample Excel file."""
     output_path = os.path.join(os.path.dirname(__file__), 'sample_excel.xlsx')
     
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        pd.DataFrame(rutas_data).to_excel(writer, sheet_name='I. Rutas', index=False)
-        pd.DataFrame(rutas_2_data).to_excel(writer, sheet_name='I. Rutas (2)', index=False)
-        pd.DataFrame(paradas_data).to_excel(writer, sheet_name='II. Paradas', index=False)
-        pd.DataFrame(expedicions_data).to_excel(writer, sheet_name='III. Expedicions', index=False)
+    wb = Workbook()
+    wb.remove(wb.active)
+    _write_sheet(wb, 'I. Rutas', rutas_data)
+    _write_sheet(wb, 'I. Rutas (2)', rutas_2_data)
+    _write_sheet(wb, 'II. Paradas', paradas_data)
+    _write_sheet(wb, 'III. Expedicions', expedicions_data)
+    wb.save(output_path)
     
     print(f"Sample Excel file created: {output_path}")
     return output_path
@@ -10,22 +10,24 @@ Validates REST API endpoints for:
 """
 
 import pytest
+import itertools
 import json
-import uuid
 from datetime import datetime, time
 from typing import List, Dict, Any
 from unittest.mock import Mock, patch, MagicMock
 
-from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from db.models import OptimizationJob
 
 
 # ============================================================
 # FIXTURES
 # ============================================================
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_routes_async() -> List[Dict[str, Any]]:
-    """Create sample routes for async tests (small set for speed)."""
+    """Create sample routes for async tests (small set for speed, read-only)."""
     return [
         {
             "id": "R001_E",
@@ -66,47 +68,117 @@ def sample_routes_async() -> List[Dict[str, Any]]:
     ]
 
 
-@pytest.fixture
-def client():
-    """Create a test client for the FastAPI app."""
-    try:
-        from main import app
-        return TestClient(app)
-    except ImportError:
-        pytest.skip("Main app not available")
+COMPLETED_RESULT = {
+    "schedule": [
+        {"bus_id": "BUS001", "items": []}
+    ],
+    "stats": {"total_buses": 1}
+}
+
+
+# Tests never depend on wall-clock timestamps or random ids.
+FIXED_NOW = datetime(2024, 1, 1, 0, 0, 0)
+MISSING_JOB_ID = "ffffffff-ffff-ffff-ffff-ffffffffffff"
+_job_ids = itertools.count()
+
+
+def make_job(status: str, **fields) -> OptimizationJob:
+    """Build an unsaved v6 OptimizationJob in the given status."""
+    return OptimizationJob(
+        id=f"00000000-0000-0000-0000-{next(_job_ids):012d}",
+        algorithm="v6",
+        created_at=FIXED_NOW,
+        status=status,
+        **fields
+    )
+
+
+@pytest.fixture(scope="module")
+def seeded_jobs(db_engine):
+    """
+    Insert one job per status in a single batch and yield ``{status: job_id}``.
+    
+    The rows are shared by the status, result and cancel classes. Tests also
+    request ``db_session``, which rolls back whatever the API writes, so a
+    cancel test never leaks its status change to the next one.
+    """
+    jobs = [
+        make_job(
+            "completed",
+            started_at=FIXED_NOW,
+            completed_at=FIXED_NOW,
+            result=COMPLETED_RESULT,
+            stats={"total_buses": 1}
+        ),
+        make_job("running", started_at=FIXED_NOW),
+        make_job("failed", error_message="Optimization error"),
+        make_job("queued"),
+        make_job("cancelled", completed_at=FIXED_NOW),
+    ]
+    ids = {job.status: job.id for job in jobs}
+    
+    with Session(db_engine) as session:
+        session.bulk_save_objects(jobs)
+        session.commit()
+    
+    yield ids
+    
+    with Session(db_engine) as session:
+        session.query(OptimizationJob).filter(
+            OptimizationJob.id.in_(list(ids.values()))
+        ).delete(synchronize_session=False)
+        session.commit()
+
+
+@pytest.fixture(autouse=True)
+def _celery_mode(celery_mode):
+    """Apply the shared ``celery_mode`` fixture to every test in the module."""
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+@pytest.fixture(scope="module")
+def sample_routes_async_json(sample_routes_async) -> bytes:
+    """Request body for /optimize-async, encoded once per module."""
+    return json.dumps(sample_routes_async).encode("utf-8")
 
 
 @pytest.fixture
-def db_session():
-    """Create a database session for testing."""
-    try:
-        from db.database import SessionLocal, is_database_available
-        
-        if not is_database_available():
-            pytest.skip("Database not available")
-        
-        db = SessionLocal()
-        yield db
-        db.close()
-    except ImportError:
-        pytest.skip("Database not available")
+def fake_async_result(monkeypatch):
+    """
+    Serve /tasks/{task_id} from a stub Celery app whose tasks are PENDING.
+    
+    Avoids a round trip to (or a timeout against) the real result backend.
+    """
+    import main
+    
+    result = Mock(status="PENDING", state="PENDING", result=None)
+    result.successful.return_value = False
+    result.failed.return_value = False
+    
+    monkeypatch.setattr(main, "CELERY_ENABLED", True)
+    monkeypatch.setattr(main, "celery_app", Mock(AsyncResult=Mock(return_value=result)))
+    return result
 
 
 # ============================================================
 # TESTS - OPTIMIZE-ASYNC ENDPOINT
 # ============================================================
 
+@pytest.mark.optimizer
 class TestOptimizeAsync:
     """Test /optimize-async endpoint."""
     
-    def test_optimize_async_creates_job(self, client, sample_routes_async):
+    def test_optimize_async_creates_job(self, client, sample_routes_async_json):
         """Test POST /optimize-async creates a job."""
         response = client.post(
             "/optimize-async",
-            json=sample_routes_async
+            content=sample_routes_async_json,
+            headers=JSON_HEADERS
         )
         
-        assert response.status_code == 200
+        assert response.status_code == 200, response.text
         data = response.json()
         
         # Verify response structure
@@ -119,14 +191,15 @@ class TestOptimizeAsync:
         assert "/ws/optimize/" in data["websocket_url"]
         assert data["job_id"] in data["websocket_url"]
     
-    def test_optimize_async_returns_task_id_when_celery_enabled(self, client, sample_routes_async):
+    def test_optimize_async_returns_task_id_when_celery_enabled(self, client, sample_routes_async_json):
         """Test that task_id is returned when Celery is enabled."""
         response = client.post(
             "/optimize-async",
-            json=sample_routes_async
+            content=sample_routes_async_json,
+            headers=JSON_HEADERS
         )
         
-        assert response.status_code == 200
+        assert response.status_code == 200, response.text
         data = response.json()
         
         # task_id may be None (sync mode) or a string (async mode)
@@ -152,16 +225,15 @@ class TestOptimizeAsync:
         # Should return validation error
         assert response.status_code in [400, 422]
     
-    def test_optimize_async_saves_job_to_database(self, client, sample_routes_async, db_session):
+    def test_optimize_async_saves_job_to_database(self, client, sample_routes_async_json, db_session):
         """Test that job is saved to database."""
-        from db.models import OptimizationJob
-        
         response = client.post(
             "/optimize-async",
-            json=sample_routes_async
+            content=sample_routes_async_json,
+            headers=JSON_HEADERS
         )
         
-        assert response.status_code == 200
+        assert response.status_code == 200, response.text
         job_id = response.json()["job_id"]
         
         # Verify job exists in database
@@ -170,350 +242,141 @@ class TestOptimizeAsync:
         assert job.status in ["queued", "completed", "running"]
         assert job.algorithm == "v6"
         assert job.input_data is not None
-        
-        # Clean up
-        db_session.delete(job)
-        db_session.commit()
 
 
 # ============================================================
 # TESTS - GET JOB STATUS ENDPOINT
 # ============================================================
 
+@pytest.mark.usefixtures("db_session")
 class TestGetJobStatus:
     """Test GET /jobs/{job_id} endpoint."""
     
     def test_get_job_status_not_found(self, client):
         """Test GET /jobs/{job_id} with non-existent job."""
-        response = client.get(f"/jobs/{uuid.uuid4()}")
+        response = client.get(f"/jobs/{MISSING_JOB_ID}")
         
         assert response.status_code == 404
     
-    def test_get_job_status_success(self, client, db_session):
+    def test_get_job_status_success(self, client, seeded_jobs):
         """Test GET /jobs/{job_id} returns job status."""
-        from db.models import OptimizationJob
-        
-        # Create a job
-        job_id = str(uuid.uuid4())
-        job = OptimizationJob(
-            id=job_id,
-            status="running",
-            algorithm="v6",
-            created_at=datetime.utcnow()
-        )
-        db_session.add(job)
-        db_session.commit()
-        
-        try:
-            response = client.get(f"/jobs/{job_id}")
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert data["job_id"] == job_id
-            assert data["status"] == "running"
-            assert data["algorithm"] == "v6"
-            assert "created_at" in data
-            
-        finally:
-            # Clean up
-            db_session.delete(job)
-            db_session.commit()
+        job_id = seeded_jobs["running"]
+        response = client.get(f"/jobs/{job_id}")
+        
+        assert response.status_code == 200, response.text
+        data = response.json()
+        
+        assert data["job_id"] == job_id
+        assert data["status"] == "running"
+        assert data["algorithm"] == "v6"
+        assert "created_at" in data
     
-    def test_get_job_status_completed(self, client, db_session):
+    def test_get_job_status_completed(self, client, seeded_jobs):
         """Test GET /jobs/{job_id} for completed job."""
-        from db.models import OptimizationJob
-        
-        job_id = str(uuid.uuid4())
-        job = OptimizationJob(
-            id=job_id,
-            status="completed",
-            algorithm="v6",
-            created_at=datetime.utcnow(),
-            started_at=datetime.utcnow(),
-            completed_at=datetime.utcnow(),
-            result={"schedule": [], "stats": {}},
-            stats={"total_buses": 5}
-        )
-        db_session.add(job)
-        db_session.commit()
-        
-        try:
-            response = client.get(f"/jobs/{job_id}")
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert data["status"] == "completed"
-            assert "completed_at" in data
-            
-        finally:
-            db_session.delete(job)
-            db_session.commit()
+        response = client.get(f"/jobs/{seeded_jobs['completed']}")
+        
+        assert response.status_code == 200, response.text
+        data = response.json()
+        
+        assert data["status"] == "completed"
+        assert "completed_at" in data
     
-    def test_get_job_status_failed(self, client, db_session):
+    def test_get_job_status_failed(self, client, seeded_jobs):
         """Test GET /jobs/{job_id} for failed job."""
-        from db.models import OptimizationJob
-        
-        job_id = str(uuid.uuid4())
-        job = OptimizationJob(
-            id=job_id,
-            status="failed",
-            algorithm="v6",
-            created_at=datetime.utcnow(),
-            error_message="Optimization failed"
-        )
-        db_session.add(job)
-        db_session.commit()
-        
-        try:
-            response = client.get(f"/jobs/{job_id}")
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert data["status"] == "failed"
-            assert data["error"] == "Optimization failed"
-            
-        finally:
-            db_session.delete(job)
-            db_session.commit()
+        response = client.get(f"/jobs/{seeded_jobs['failed']}")
+        
+        assert response.status_code == 200, response.text
+        data = response.json()
+        
+        assert data["status"] == "failed"
+        assert data["error"] == "Optimization error"
 
 
 # ============================================================
 # TESTS - GET JOB RESULT ENDPOINT
 # ============================================================
 
+@pytest.mark.usefixtures("db_session")
 class TestGetJobResult:
     """Test GET /jobs/{job_id}/result endpoint."""
     
     def test_get_job_result_not_found(self, client):
         """Test GET /jobs/{job_id}/result with non-existent job."""
-        response = client.get(f"/jobs/{uuid.uuid4()}/result")
+        response = client.get(f"/jobs/{MISSING_JOB_ID}/result")
         
         assert response.status_code == 404
     
-    def test_get_job_result_completed(self, client, db_session):
-        """Test GET /jobs/{job_id}/result for completed job."""
-        from db.models import OptimizationJob
-        
-        job_id = str(uuid.uuid4())
-        result_data = {
-            "schedule": [
-                {"bus_id": "BUS001", "items": []}
-            ],
-            "stats": {"total_buses": 1}
-        }
+    @pytest.mark.parametrize("status,expect", [
+        ("completed", {"result": COMPLETED_RESULT, "stats": {"total_buses": 1}}),
+        ("running", {}),
+        ("failed", {"error": "Optimization error"}),
+    ])
+    def test_get_job_result_by_status(self, client, seeded_jobs, status, expect):
+        """Test GET /jobs/{job_id}/result for completed, running and failed jobs."""
+        job_id = seeded_jobs[status]
+        response = client.get(f"/jobs/{job_id}/result")
+        
+        assert response.status_code == 200, response.text
+        data = response.json()
         
-        job = OptimizationJob(
-            id=job_id,
-            status="completed",
-            algorithm="v6",
-            created_at=datetime.utcnow(),
-            result=result_data,
-            stats={"total_buses": 1}
-        )
-        db_session.add(job)
-        db_session.commit()
-        
-        try:
-            response = client.get(f"/jobs/{job_id}/result")
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert data["job_id"] == job_id
-            assert data["status"] == "completed"
-            assert "result" in data
-            assert data["result"] == result_data
-            assert "stats" in data
-            
-        finally:
-            db_session.delete(job)
-            db_session.commit()
-    
-    def test_get_job_result_running(self, client, db_session):
-        """Test GET /jobs/{job_id}/result for running job."""
-        from db.models import OptimizationJob
-        
-        job_id = str(uuid.uuid4())
-        job = OptimizationJob(
-            id=job_id,
-            status="running",
-            algorithm="v6",
-            created_at=datetime.utcnow()
-        )
-        db_session.add(job)
-        db_session.commit()
-        
-        try:
-            response = client.get(f"/jobs/{job_id}/result")
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert data["job_id"] == job_id
-            assert data["status"] == "running"
-            
-        finally:
-            db_session.delete(job)
-            db_session.commit()
-    
-    def test_get_job_result_failed(self, client, db_session):
-        """Test GET /jobs/{job_id}/result for failed job."""
-        from db.models import OptimizationJob
-        
-        job_id = str(uuid.uuid4())
-        job = OptimizationJob(
-            id=job_id,
-            status="failed",
-            algorithm="v6",
-            created_at=datetime.utcnow(),
-            error_message="Optimization error"
-        )
-        db_session.add(job)
-        db_session.commit()
-        
-        try:
-            response = client.get(f"/jobs/{job_id}/result")
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert data["status"] == "failed"
-            assert data["error"] == "Optimization error"
-            
-        finally:
-            db_session.delete(job)
-            db_session.commit()
+        assert data["job_id"] == job_id
+        assert data["status"] == status
+        for key, value in expect.items():
+            assert data[key] == value
 
 
 # ============================================================
 # TESTS - CANCEL JOB ENDPOINT
 # ============================================================
 
+@pytest.mark.usefixtures("db_session")
 class TestCancelJob:
     """Test DELETE /jobs/{job_id} endpoint."""
     
     def test_cancel_job_not_found(self, client):
         """Test DELETE /jobs/{job_id} with non-existent job."""
-        response = client.delete(f"/jobs/{uuid.uuid4()}")
+        response = client.delete(f"/jobs/{MISSING_JOB_ID}")
         
         assert response.status_code == 404
     
-    def test_cancel_job_queued(self, client, db_session):
+    def test_cancel_job_queued(self, client, seeded_jobs):
         """Test canceling a queued job."""
-        from db.models import OptimizationJob
-        
-        job_id = str(uuid.uuid4())
-        job = OptimizationJob(
-            id=job_id,
-            status="queued",
-            algorithm="v6",
-            created_at=datetime.utcnow()
-        )
-        db_session.add(job)
-        db_session.commit()
-        
-        try:
-            response = client.delete(f"/jobs/{job_id}")
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert data["job_id"] == job_id
-            assert data["status"] == "cancelled"
-            assert "message" in data
-            
-            # Verify job was updated in database
-            db_session.refresh(job)
-            assert job.status == "cancelled"
-            
-        finally:
-            db_session.delete(job)
-            db_session.commit()
+        job_id = seeded_jobs["queued"]
+        response = client.delete(f"/jobs/{job_id}")
+        
+        assert response.status_code == 200, response.text
+        data = response.json()
+        
+        assert data["job_id"] == job_id
+        assert data["status"] == "cancelled"
+        assert "message" in data
     
-    def test_cancel_job_running(self, client, db_session):
+    def test_cancel_job_running(self, client, seeded_jobs):
         """Test canceling a running job."""
-        from db.models import OptimizationJob
-        
-        job_id = str(uuid.uuid4())
-        job = OptimizationJob(
-            id=job_id,
-            status="running",
-            algorithm="v6",
-            created_at=datetime.utcnow(),
-            started_at=datetime.utcnow()
-        )
-        db_session.add(job)
-        db_session.commit()
-        
-        try:
-            response = client.delete(f"/jobs/{job_id}")
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert data["status"] == "cancelled"
-            
-            db_session.refresh(job)
-            assert job.status == "cancelled"
-            
-        finally:
-            db_session.delete(job)
-            db_session.commit()
+        job_id = seeded_jobs["running"]
+        response = client.delete(f"/jobs/{job_id}")
+        
+        assert response.status_code == 200, response.text
+        data = response.json()
+        
+        assert data["status"] == "cancelled"
     
-    def test_cancel_completed_job_fails(self, client, db_session):
+    def test_cancel_completed_job_fails(self, client, db_session, seeded_jobs):
         """Test that canceling a completed job fails."""
-        from db.models import OptimizationJob
-        
-        job_id = str(uuid.uuid4())
-        job = OptimizationJob(
-            id=job_id,
-            status="completed",
-            algorithm="v6",
-            created_at=datetime.utcnow(),
-            completed_at=datetime.utcnow()
-        )
-        db_session.add(job)
-        db_session.commit()
-        
-        try:
-            response = client.delete(f"/jobs/{job_id}")
-            
-            assert response.status_code == 400
-            
-            # Verify job status unchanged
-            db_session.refresh(job)
-            assert job.status == "completed"
-            
-        finally:
-            db_session.delete(job)
-            db_session.commit()
+        job_id = seeded_jobs["completed"]
+        response = client.delete(f"/jobs/{job_id}")
+        
+        assert response.status_code == 400
+        
+        # Verify job status unchanged
+        job = db_session.get(OptimizationJob, job_id)
+        assert job.status == "completed"
     
-    def test_cancel_cancelled_job_fails(self, client, db_session):
+    def test_cancel_cancelled_job_fails(self, client, seeded_jobs):
         """Test that canceling an already cancelled job fails."""
-        from db.models import OptimizationJob
-        
-        job_id = str(uuid.uuid4())
-        job = OptimizationJob(
-            id=job_id,
-            status="cancelled",
-            algorithm="v6",
-            created_at=datetime.utcnow(),
-            completed_at=datetime.utcnow()
-        )
-        db_session.add(job)
-        db_session.commit()
+        response = client.delete(f"/jobs/{seeded_jobs['cancelled']}")
         
-        try:
-            response = client.delete(f"/jobs/{job_id}")
-            
-            assert response.status_code == 400
-            
-        finally:
-            db_session.delete(job)
-            db_session.commit()
+        assert response.status_code == 400
 
 
 # ============================================================
@@ -523,21 +386,22 @@ class TestCancelJob:
 class TestGetTaskStatus:
     """Test GET /tasks/{task_id} endpoint."""
     
-    def test_get_task_status(self, client):
+    def test_get_task_status(self, client, fake_async_result):
         """Test GET /tasks/{task_id}."""
-        # Note: This requires Celery to be running
-        # In test environment, may return 503 if Celery not available
         response = client.get("/tasks/test-task-id")
         
-        # Either returns task status or 503 if Celery not available
-        assert response.status_code in [200, 503]
+        assert response.status_code == 200, response.text
+        data = response.json()
+        
+        assert data["task_id"] == "test-task-id"
+        assert data["state"] == "PENDING"
     
-    def test_get_task_status_invalid_id(self, client):
+    def test_get_task_status_invalid_id(self, client, fake_async_result):
         """Test GET /tasks/{task_id} with invalid task ID."""
         response = client.get("/tasks/invalid-task-id")
         
-        # Should handle gracefully
-        assert response.status_code in [200, 404, 503]
+        # Unknown ids are reported as PENDING by Celery
+        assert response.status_code == 200, response.text
 
 
 # ============================================================
@@ -551,12 +415,14 @@ class TestHealthCheck:
         """Test GET /health returns service status."""
         response = client.get("/health")
         
-        assert response.status_code == 200
-        data = response.json()
+        assert response.status_code == 200, response.text
         
-        assert data["status"] == "ok"
-        assert data["service"] == "tutti-backend"
-        assert "services" in data
+        # JSONResponse renders compact JSON, so the top-level keys can be
+        # matched on the raw body without decoding the services block.
+        body = response.content
+        assert b'"status":"ok"' in body
+        assert b'"service":"tutti-backend"' in body
+        assert b'"services"' in body
 
 
 # ============================================================
@@ -566,22 +432,30 @@ class TestHealthCheck:
 class TestFallbackSyncMode:
     """Test fallback to sync mode when Celery is disabled."""
     
-    def test_optimize_async_fallback(self, client, sample_routes_async, monkeypatch):
+    @pytest.fixture
+    def celery_disabled(self):
+        """Force the sync path through the app's Celery dependency."""
+        from main import app, get_celery_enabled
+        
+        app.dependency_overrides[get_celery_enabled] = lambda: False
+        yield
+        app.dependency_overrides.pop(get_celery_enabled, None)
+    
+    def test_optimize_async_fallback(self, client, sample_routes_async_json, celery_disabled):
         """Test that optimize-async works even when Celery is disabled."""
-        # Disable Celery
-        monkeypatch.setenv("CELERY_ENABLED", "false")
-        
         response = client.post(
             "/optimize-async",
-            json=sample_routes_async
+            content=sample_routes_async_json,
+            headers=JSON_HEADERS
         )
         
-        assert response.status_code == 200
+        assert response.status_code == 200, response.text
         data = response.json()
         
         # In fallback mode, job should complete synchronously
         assert "job_id" in data
-        assert data["status"] in ["queued", "completed"]
+        assert data["status"] == "completed"
+        assert data["task_id"] is None
 
 
 # ============================================================
@@ -591,14 +465,15 @@ class TestFallbackSyncMode:
 class TestWebSocketURL:
     """Test WebSocket URL generation."""
     
-    def test_websocket_url_format(self, client, sample_routes_async):
+    def test_websocket_url_format(self, client, sample_routes_async_json):
         """Test that WebSocket URL follows expected format."""
         response = client.post(
             "/optimize-async",
-            json=sample_routes_async
+            content=sample_routes_async_json,
+            headers=JSON_HEADERS
         )
         
-        assert response.status_code == 200
+        assert response.status_code == 200, response.text
         data = response.json()
         
         websocket_url = data["websocket_url"]
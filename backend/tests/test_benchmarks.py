@@ -4,9 +4,9 @@ Tests para sistema de benchmarks.
 
 import pytest
 import json
-import time
 from datetime import time as dt_time
 from pathlib import Path
+from types import SimpleNamespace
 from typing import List
 
 from models import Route, BusSchedule, ScheduleItem, Stop
@@ -24,8 +24,11 @@ from benchmarks.metrics import (
 # =============================================================================
 # Fixtures
 # =============================================================================
+# Los modelos de sample_schedule/sample_routes se construyen una vez por módulo:
+# los tests deben tratarlos como de solo lectura (usar model_copy(deep=True)
+# si alguno necesita modificarlos).
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_schedule() -> List[BusSchedule]:
     """Schedule simple para testing."""
     return [
@@ -63,7 +66,7 @@ def sample_schedule() -> List[BusSchedule]:
     ]
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_routes() -> List[Route]:
     """Rutas de ejemplo."""
     return [
@@ -112,11 +115,27 @@ def sample_routes() -> List[Route]:
     ]
 
 
+def make_result(**overrides) -> BenchmarkResult:
+    """BenchmarkResult con valores por defecto; los kwargs sobrescriben campos."""
+    fields = dict(
+        algorithm="a",
+        dataset="test",
+        n_routes=10,
+        execution_time_ms=100,
+        n_buses=5,
+        total_km=100,
+        deadhead_km=20,
+        avg_routes_per_bus=2,
+        objective_score=500
+    )
+    fields.update(overrides)
+    return BenchmarkResult(**fields)
+
+
 @pytest.fixture
 def mock_algorithm():
     """Algoritmo mock para testing."""
     def algorithm(routes: List[Route]) -> List[BusSchedule]:
-        time.sleep(0.01)  # Simular trabajo
         return [
             BusSchedule(
                 bus_id="B001",
@@ -172,7 +191,7 @@ class TestBenchmarkSuite:
         assert result.dataset == "test_dataset"
         assert result.n_routes == len(sample_routes)
         assert result.n_buses > 0
-        assert result.execution_time_ms > 0
+        assert result.execution_time_ms >= 0
         assert "n_runs" in result.metadata
     
     def test_run_benchmark_with_evaluator(self, benchmark_suite, mock_algorithm, sample_routes):
@@ -192,8 +211,12 @@ class TestBenchmarkSuite:
         
         assert result.objective_score > 0
     
-    def test_run_benchmark_multiple_runs(self, benchmark_suite, mock_algorithm, sample_routes):
+    def test_run_benchmark_multiple_runs(self, benchmark_suite, mock_algorithm, sample_routes, monkeypatch):
         """Test benchmark con múltiples runs."""
+        # Reloj controlado: los runs duran 1, 2, 3, 4 y 5 segundos
+        clock = iter([0.0, 1.0, 1.0, 3.0, 3.0, 6.0, 6.0, 10.0, 10.0, 15.0])
+        monkeypatch.setattr("benchmarks.suite.time", SimpleNamespace(time=lambda: next(clock)))
+        
         result = benchmark_suite.run_benchmark(
             algorithm=mock_algorithm,
             algorithm_name="mock_algo",
@@ -204,9 +227,10 @@ class TestBenchmarkSuite:
         )
         
         assert result.metadata["n_runs"] == 5
-        assert "time_std" in result.metadata
-        assert "time_min" in result.metadata
-        assert "time_max" in result.metadata
+        assert result.execution_time_ms == 3000.0
+        assert result.metadata["time_std"] > 0
+        assert result.metadata["time_min"] == 1000.0
+        assert result.metadata["time_max"] == 5000.0
     
     def test_run_benchmark_adds_to_results(self, benchmark_suite, mock_algorithm, sample_routes):
         """Test que benchmark agrega resultado a lista."""
@@ -246,74 +270,35 @@ class TestBenchmarkSuite:
 class TestCompareAlgorithms:
     """Tests para comparación de algoritmos."""
     
-    def test_compare_two_algorithms(self):
-        """Test comparación básica."""
-        results = [
-            BenchmarkResult(
-                algorithm="algo_a",
-                dataset="test",
-                n_routes=10,
-                execution_time_ms=100,
-                n_buses=5,
-                total_km=100,
-                deadhead_km=20,
-                avg_routes_per_bus=2,
-                objective_score=500
-            ),
-            BenchmarkResult(
-                algorithm="algo_b",
-                dataset="test",
-                n_routes=10,
-                execution_time_ms=150,
-                n_buses=4,
-                total_km=90,
-                deadhead_km=15,
-                avg_routes_per_bus=2.5,
-                objective_score=400
-            )
-        ]
+    @pytest.mark.parametrize("baseline_fields,improved_fields,buses_saved", [
+        (
+            {"algorithm": "algo_a"},
+            {"algorithm": "algo_b", "execution_time_ms": 150, "n_buses": 4, "total_km": 90,
+             "deadhead_km": 15, "avg_routes_per_bus": 2.5, "objective_score": 400},
+            1,
+        ),
+        (
+            {"algorithm": "baseline", "n_buses": 10, "avg_routes_per_bus": 1, "objective_score": 1000},
+            {"algorithm": "improved", "n_buses": 8, "total_km": 80, "deadhead_km": 15,
+             "avg_routes_per_bus": 1.25, "objective_score": 800},
+            2,
+        ),
+    ])
+    def test_compare_two_algorithms(self, baseline_fields, improved_fields, buses_saved):
+        """Test comparación contra baseline y mejoras porcentuales."""
+        results = [make_result(**baseline_fields), make_result(**improved_fields)]
         
         suite = BenchmarkSuite()
         comparison = suite.compare_algorithms(results)
         
-        assert comparison["baseline"] == "algo_a"
+        assert comparison["baseline"] == baseline_fields["algorithm"]
         assert len(comparison["comparisons"]) == 1
-        assert comparison["comparisons"][0]["algorithm"] == "algo_b"
-    
-    def test_compare_shows_improvements(self):
-        """Test que muestra mejoras porcentuales."""
-        results = [
-            BenchmarkResult(
-                algorithm="baseline",
-                dataset="test",
-                n_routes=10,
-                execution_time_ms=100,
-                n_buses=10,
-                total_km=100,
-                deadhead_km=20,
-                avg_routes_per_bus=1,
-                objective_score=1000
-            ),
-            BenchmarkResult(
-                algorithm="improved",
-                dataset="test",
-                n_routes=10,
-                execution_time_ms=100,
-                n_buses=8,
-                total_km=80,
-                deadhead_km=15,
-                avg_routes_per_bus=1.25,
-                objective_score=800
-            )
-        ]
-        
-        suite = BenchmarkSuite()
-        comparison = suite.compare_algorithms(results)
+        assert comparison["comparisons"][0]["algorithm"] == improved_fields["algorithm"]
         
         vs_baseline = comparison["comparisons"][0]["vs_baseline"]
         assert "buses" in vs_baseline
-        assert "buses_saved" in vs_baseline
-        assert vs_baseline["buses_saved"] == 2
+        assert vs_baseline["buses_saved"] == buses_saved
+        assert comparison["summary"]["best_algorithm"] == improved_fields["algorithm"]
     
     def test_compare_empty_results(self):
         """Test comparación con resultados vacíos."""
@@ -393,8 +378,7 @@ class TestSaveLoadResults:
         assert "comparisons" in data
     
     def test_load_results(self, tmp_path):
-        """Test cargar resultados."""
-        # Crear archivo de prueba
+        """Test cargar resultados desde datos ya parseados."""
         data = {
             "timestamp": "2024-01-01T00:00:00",
             "results": [
@@ -414,16 +398,33 @@ class TestSaveLoadResults:
             ]
         }
         
-        output_dir = tmp_path / "benchmarks"
-        output_dir.mkdir()
-        with open(output_dir / "load_test.json", "w") as f:
-            json.dump(data, f)
-        
-        suite = BenchmarkSuite(output_dir=str(output_dir))
-        suite.load_results("load_test.json")
+        suite = BenchmarkSuite.from_dict(data, output_dir=str(tmp_path / "benchmarks"))
         
         assert len(suite.results) == 1
         assert suite.results[0].algorithm == "loaded_algo"
+    
+    def test_save_then_load_roundtrip(self, benchmark_suite):
+        """Test que save_results y load_results son inversos."""
+        benchmark_suite.results = [
+            BenchmarkResult(
+                algorithm="roundtrip_algo",
+                dataset="test",
+                n_routes=10,
+                execution_time_ms=100,
+                n_buses=5,
+                total_km=100,
+                deadhead_km=20,
+                avg_routes_per_bus=2,
+                objective_score=500,
+                metadata={"n_runs": 3}
+            )
+        ]
+        benchmark_suite.save_results("roundtrip.json")
+        
+        suite = BenchmarkSuite(output_dir=str(benchmark_suite.output_dir))
+        suite.load_results("roundtrip.json")
+        
+        assert suite.results == benchmark_suite.results
 
 
 # =============================================================================
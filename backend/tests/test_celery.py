@@ -7,11 +7,14 @@ Validates the async optimization workflow including:
 - Error handling and retries
 - Database integration
 
-NOTE: These tests require Celery + Redis + PostgreSQL.  They are skipped
-automatically in environments where those services are unavailable (CI,
-desktop builds, etc.).
+NOTE: These tests only need the Celery package. Redis is replaced by an
+in-process fakeredis server and the database by the shared in-memory SQLite
+engine, so they run without a broker (CI, desktop builds, etc.).
 """
 
+import importlib.util
+import inspect
+import operator
 import pytest
 import json
 from datetime import datetime, time
@@ -22,26 +25,25 @@ import uuid
 # Import models
 from models import Route, Stop
 
-# ---- Skip the entire module when Celery infra is not available ----
-def _check_celery_infra() -> bool:
-    """Return True only when Celery, Redis and the task module are usable."""
-    try:
-        from celery_app import celery_app as _app  # noqa: F401
-        from tasks import optimize_task as _task  # noqa: F401
-        # Quick smoke-test: if the broker/backend is unreachable the tests
-        # will hang or raise.  Check whether Redis (default broker) responds.
-        import redis
-        r = redis.Redis.from_url(_app.conf.broker_url, socket_connect_timeout=1)
-        r.ping()
-        return True
-    except Exception:
-        return False
-
-_CELERY_INFRA_OK = _check_celery_infra()
+# find_spec checks for the package without executing its __init__.
+HAS_CELERY = importlib.util.find_spec("celery") is not None
 
+# Imported once at collection time; ``None`` when the Celery stack is missing.
+try:
+    import tasks
+    import celery_app as celery_app_module
+    from celery_app import celery_app
+    from config import config
+except ImportError:
+    tasks = celery_app_module = celery_app = config = None
+
+
+# Only the Celery stack itself is required: tasks run in-process through
+# ``.run``, Redis is served by fakeredis and the database is the in-memory
+# engine from conftest.py, so no live broker is needed.
 pytestmark = pytest.mark.skipif(
-    not _CELERY_INFRA_OK,
-    reason="Celery/Redis infrastructure not available – skipping Celery tests",
+    tasks is None,
+    reason="Celery stack not importable – skipping Celery tests",
 )
 
 
@@ -49,21 +51,24 @@ pytestmark = pytest.mark.skipif(
 # FIXTURES
 # ============================================================
 
-@pytest.fixture
-def sample_routes_small() -> List[Route]:
-    """Create a small set of routes for fast Celery tests."""
+def _build_sample_routes_small() -> List[Route]:
+    """Create a small set of routes for fast Celery tests.
+
+    The values are known-good literals, so ``model_construct`` skips
+    validation.
+    """
     routes = []
     
     # Entry routes
     for i in range(3):
         stops = [
-            Stop(name=f"Stop {i}-A", lat=42.235 + i*0.01, lon=-8.715 - i*0.01, 
+            Stop.model_construct(name=f"Stop {i}-A", lat=42.235 + i*0.01, lon=-8.715 - i*0.01, 
                  order=1, time_from_start=0, passengers=5),
-            Stop(name="School", lat=42.245, lon=-8.725, order=2, 
+            Stop.model_construct(name="School", lat=42.245, lon=-8.725, order=2, 
                  time_from_start=20, passengers=0, is_school=True),
         ]
         
-        route = Route(
+        route = Route.model_construct(
             id=f"R{i:03d}_E",
             name=f"Route {i} Entry",
             stops=stops,
@@ -81,13 +86,13 @@ def sample_routes_small() -> List[Route]:
     # Exit routes
     for i in range(2):
         stops = [
-            Stop(name=f"Stop {i}-B", lat=42.238 + i*0.01, lon=-8.718 - i*0.01, 
+            Stop.model_construct(name=f"Stop {i}-B", lat=42.238 + i*0.01, lon=-8.718 - i*0.01, 
                  order=1, time_from_start=0, passengers=5),
-            Stop(name="School", lat=42.248, lon=-8.728, order=2, 
+            Stop.model_construct(name="School", lat=42.248, lon=-8.728, order=2, 
                  time_from_start=25, passengers=0, is_school=True),
         ]
         
-        route = Route(
+        route = Route.model_construct(
             id=f"R{i:03d}_X",
             name=f"Route {i} Exit",
             stops=stops,
@@ -105,67 +110,145 @@ def sample_routes_small() -> List[Route]:
     return routes
 
 
+# Built and serialized once at import. Shared read-only by every test: copy
+# with ``copy.deepcopy`` before mutating.
+_SAMPLE_ROUTES = _build_sample_routes_small()
+# Same JSON-safe shape main.py enqueues (times as strings), so the payload
+# can also be stored in the job's JSON ``input_data`` column.
+_SAMPLE_ROUTES_DATA = [r.model_dump(mode="json") for r in _SAMPLE_ROUTES]
+
+
+@pytest.fixture(scope="module")
+def sample_routes_small() -> List[Route]:
+    """Small set of routes, shared read-only across the module."""
+    return _SAMPLE_ROUTES
+
+
+@pytest.fixture(scope="module")
+def sample_routes_data() -> List[Dict[str, Any]]:
+    """Pre-serialized task input for ``sample_routes_small``."""
+    return _SAMPLE_ROUTES_DATA
+
+
+@pytest.fixture(scope="module")
+def fake_redis_server():
+    """In-process Redis server shared by the module (requires fakeredis)."""
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture(scope="module")
+def fake_redis(fake_redis_server):
+    """Client for ``fake_redis_server``; supports real pipeline/pub-sub semantics."""
+    import fakeredis
+    return fakeredis.FakeRedis(server=fake_redis_server)
+
+
+# The module-scoped connection holds an outer transaction on the single
+# StaticPool connection of conftest's ``db_engine`` until the module ends, so
+# every DB test here must use this module's ``db_session`` (which overrides
+# conftest's): opening a second transaction on that connection would fail.
+
+@pytest.fixture(scope="module")
+def db_connection(db_engine):
+    """One connection for the module, inside an outer transaction."""
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def db_session(db_connection, monkeypatch):
+    """
+    Session for a single test, rolled back to a SAVEPOINT on teardown.
+
+    The task module's ``SessionLocal`` is bound to the same connection so
+    tasks see the rows the test commits, and nothing has to be deleted
+    afterwards.
+    """
+    from sqlalchemy.orm import Session, sessionmaker
+
+    savepoint = db_connection.begin_nested()
+    session = Session(bind=db_connection, join_transaction_mode="create_savepoint")
+    monkeypatch.setattr(
+        tasks,
+        "SessionLocal",
+        sessionmaker(bind=db_connection, join_transaction_mode="create_savepoint"),
+    )
+    monkeypatch.setattr(tasks, "is_database_available", lambda: True)
+    yield session
+    session.close()
+    savepoint.rollback()
+
+
+class _RetryTriggered(Exception):
+    """Raised by stubbed ``task.retry`` so tests can assert the retry path."""
+
+
 @pytest.fixture
 def mock_celery_task():
     """Create a mock Celery task for testing."""
     task = Mock()
     task.request.retries = 0
     task.update_state = Mock()
-    task.retry = Mock(side_effect=Exception("Retry triggered"))
+    task.retry = Mock(side_effect=_RetryTriggered)
     return task
 
 
-@pytest.fixture
-def sample_routes_data(sample_routes_small):
-    """Convert sample routes to dict format for task input."""
-    return [r.dict() for r in sample_routes_small]
-
-
 # ============================================================
 # TESTS - TASK CONFIGURATION
 # ============================================================
 
+_SERIALIZER = getattr(celery_app_module, "SERIALIZER", "json")
+
+
 class TestCeleryConfiguration:
     """Test Celery app configuration."""
     
-    def test_celery_app_imports(self):
-        """Test that Celery app can be imported."""
-        try:
-            from celery_app import celery_app
-            assert celery_app is not None
-        except ImportError:
-            pytest.skip("Celery not available")
-    
-    def test_celery_app_configuration(self):
+    @pytest.mark.parametrize("attr, expected", [
+        ("main", "tutti"),
+        ("conf.task_serializer", _SERIALIZER),
+        ("conf.result_serializer", _SERIALIZER),
+        ("conf.timezone", "UTC"),
+        ("conf.enable_utc", True),
+        ("conf.task_track_started", True),
+        ("conf.task_time_limit", 3600),
+    ])
+    def test_celery_app_configuration(self, attr, expected):
         """Test Celery app is properly configured."""
-        try:
-            from celery_app import celery_app
-            
-            assert celery_app.main == "tutti"
-            assert celery_app.conf.task_serializer == "json"
-            assert celery_app.conf.accept_content == ["json"]
-            assert celery_app.conf.result_serializer == "json"
-            assert celery_app.conf.timezone == "UTC"
-            assert celery_app.conf.enable_utc is True
-            assert celery_app.conf.task_track_started is True
-            assert celery_app.conf.task_time_limit == 3600
-        except ImportError:
-            pytest.skip("Celery not available")
+        assert operator.attrgetter(attr)(celery_app) == expected
+    
+    def test_celery_app_accepts_json(self):
+        """Test that plain JSON messages are always accepted."""
+        assert celery_app.conf.accept_content == celery_app_module.ACCEPT_CONTENT
+        assert "json" in celery_app.conf.accept_content
+    
+    @pytest.mark.skipif(
+        celery_app_module is None or celery_app_module.orjson is None,
+        reason="orjson not installed"
+    )
+    def test_orjson_serializer_round_trips_task_result(self):
+        """Test that the orjson serializer handles a task result payload."""
+        from kombu.serialization import dumps, loads
+        
+        result = {"schedule": [{"start_time": time(8, 0), "items": (1, 2)}], "stats": {}}
+        content_type, encoding, data = dumps(result, serializer="orjson")
+        
+        assert loads(data, content_type, encoding) == {
+            "schedule": [{"start_time": "08:00:00", "items": [1, 2]}],
+            "stats": {},
+        }
     
     def test_optimize_task_registered(self):
         """Test that optimize_task is registered with Celery."""
-        try:
-            from celery_app import celery_app
-            from tasks import optimize_task
-            
-            # Check task is registered
-            assert "tasks.optimize_task" in celery_app.tasks
-            
-            # Check task configuration
-            assert optimize_task.bind is True
-            assert optimize_task.max_retries == 3
-        except ImportError:
-            pytest.skip("Celery or tasks not available")
+        # Check task is registered
+        assert "tasks.optimize_task" in celery_app.tasks
+        
+        # Check task configuration (bind=True makes run a bound method)
+        assert inspect.ismethod(tasks.optimize_task.run)
+        assert tasks.optimize_task.max_retries == 3
 
 
 # ============================================================
@@ -177,83 +260,84 @@ class TestProgressCallback:
     
     def test_progress_callback_creation(self, mock_celery_task):
         """Test that progress callback can be created."""
-        try:
-            from tasks import _create_progress_callback
-            
-            callback = _create_progress_callback(mock_celery_task, "test-job-123")
-            assert callable(callback)
-        except ImportError:
-            pytest.skip("Tasks not available")
+        callback = tasks._create_progress_callback(mock_celery_task, "test-job-123")
+        assert callable(callback)
     
     def test_progress_callback_updates_state(self, mock_celery_task):
         """Test that progress callback updates Celery state."""
-        try:
-            from tasks import _create_progress_callback
-            
-            callback = _create_progress_callback(mock_celery_task, "test-job-123")
-            
-            # Call with progress update
-            callback("optimizing", 50, "Halfway there")
-            
-            # Verify update_state was called
-            assert mock_celery_task.update_state.called
-            
-            # Check the call arguments
-            call_args = mock_celery_task.update_state.call_args
-            assert call_args[1]["state"] == "PROGRESS"
-            meta = call_args[1]["meta"]
-            assert meta["phase"] == "optimizing"
-            assert meta["progress"] == 50
-            assert meta["message"] == "Halfway there"
-            assert meta["job_id"] == "test-job-123"
-        except ImportError:
-            pytest.skip("Tasks not available")
+        callback = tasks._create_progress_callback(mock_celery_task, "test-job-123")
+        
+        # Call with progress update
+        callback("optimizing", 50, "Halfway there")
+        
+        # Verify update_state was called
+        assert mock_celery_task.update_state.called
+        
+        # Check the call arguments
+        call_args = mock_celery_task.update_state.call_args
+        assert call_args[1]["state"] == "PROGRESS"
+        meta = call_args[1]["meta"]
+        assert meta["phase"] == "optimizing"
+        assert meta["progress"] == 50
+        assert meta["message"] == "Halfway there"
+        assert meta["job_id"] == "test-job-123"
     
     def test_progress_callback_throttling(self, mock_celery_task):
         """Test that progress callback throttles updates."""
-        try:
-            from tasks import _create_progress_callback
-            import time
-            
-            callback = _create_progress_callback(mock_celery_task, "test-job-123", update_interval=0.5)
-            
-            # Call multiple times rapidly
-            callback("phase1", 10, "Start")
-            callback("phase1", 11, "Still going")  # Should be throttled
-            callback("phase1", 12, "Still going")  # Should be throttled
-            
-            # Only first call should trigger update (small progress diff)
-            assert mock_celery_task.update_state.call_count == 1
-            
-            # Wait and call with significant progress
-            time.sleep(0.6)
-            callback("phase1", 50, "Halfway")  # Should trigger (large progress jump)
-            
-            assert mock_celery_task.update_state.call_count == 2
-        except ImportError:
-            pytest.skip("Tasks not available")
+        fake_now = [100.0]
+        callback = tasks._create_progress_callback(
+            mock_celery_task, "test-job-123", update_interval=0.5, clock=lambda: fake_now[0]
+        )
+        
+        # Call multiple times rapidly
+        callback("phase1", 10, "Start")
+        callback("phase1", 11, "Still going")  # Should be throttled
+        callback("phase1", 12, "Still going")  # Should be throttled
+        
+        # Only first call should trigger update (small progress diff)
+        assert mock_celery_task.update_state.call_count == 1
+        
+        # A large jump inside the interval is coalesced as well
+        callback("phase1", 40, "Jump")
+        assert mock_celery_task.update_state.call_count == 1
+        
+        # Advance the clock past the interval and call with significant progress
+        fake_now[0] += 0.6
+        callback("phase1", 50, "Halfway")  # Should trigger (large progress jump)
+        
+        assert mock_celery_task.update_state.call_count == 2
+    
+    def test_progress_callback_always_sends_phase_changes(self, mock_celery_task):
+        """Test that a new phase is reported even inside the throttle window."""
+        callback = tasks._create_progress_callback(
+            mock_celery_task, "test-job-123", update_interval=10.0, clock=lambda: 100.0
+        )
+        
+        callback("loading", 2, "Loading")
+        callback("optimizing", 3, "Optimizing")
+        
+        assert mock_celery_task.update_state.call_count == 2
+        assert mock_celery_task.update_state.call_args[1]["meta"]["phase"] == "optimizing"
     
     def test_progress_callback_always_sends_boundary_values(self, mock_celery_task):
         """Test that 0% and 100% are always sent."""
-        try:
-            from tasks import _create_progress_callback
-            
-            callback = _create_progress_callback(mock_celery_task, "test-job-123")
-            
-            # Call with 0% - should always be sent
-            callback("starting", 0, "Starting")
-            assert mock_celery_task.update_state.call_count == 1
-            
-            # Call with intermediate - should be throttled
-            callback("phase", 1, "Working")
-            # May or may not be sent depending on timing
-            
-            # Call with 100% - should always be sent
-            callback("completed", 100, "Done")
-            # At least 2 calls (0% and 100%)
-            assert mock_celery_task.update_state.call_count >= 2
-        except ImportError:
-            pytest.skip("Tasks not available")
+        callback = tasks._create_progress_callback(
+            mock_celery_task, "test-job-123", update_interval=10.0, clock=lambda: 100.0
+        )
+        
+        # Call with 0% - always sent
+        callback("starting", 0, "Starting")
+        assert mock_celery_task.update_state.call_count == 1
+        
+        # New phase - always sent; a second call in the same phase is coalesced
+        callback("phase", 1, "Working")
+        callback("phase", 2, "Working")
+        assert mock_celery_task.update_state.call_count == 2
+        
+        # Call with 100% in the same phase - sent despite the throttle window
+        callback("phase", 100, "Done")
+        assert mock_celery_task.update_state.call_count == 3
+        assert mock_celery_task.update_state.call_args[1]["meta"]["progress"] == 100
 
 
 # ============================================================
@@ -263,54 +347,58 @@ class TestProgressCallback:
 class TestRedisPublish:
     """Test Redis publish functionality for WebSocket integration."""
     
-    @patch("tasks.redis.Redis")
-    def test_publish_to_redis_success(self, mock_redis_class):
+    @pytest.fixture(autouse=True)
+    def redis_client(self, fake_redis):
+        """Serve the shared in-process Redis as the task module's cached client."""
+        with patch("tasks._get_redis_client", return_value=fake_redis) as get_client, \
+                patch.object(config, "is_redis_available", return_value=True):
+            yield get_client
+    
+    def test_publish_to_redis_success(self, fake_redis):
         """Test successful publish to Redis."""
-        try:
-            from tasks import _publish_to_redis
-            from config import config
-            
-            # Mock Redis client
-            mock_client = Mock()
-            mock_client.ping.return_value = True
-            mock_redis_class.from_url.return_value = mock_client
-            
-            # Mock config to indicate Redis is available
-            with patch.object(config, "is_redis_available", return_value=True):
-                result = _publish_to_redis("job-123", "optimizing", 50, "Halfway")
-            
-            assert result is True
-            assert mock_client.publish.call_count == 2  # Job channel + all channel
-        except ImportError:
-            pytest.skip("Tasks or config not available")
+        pubsub = fake_redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe("job_progress:job-123", "job_progress:all")
+        
+        with patch.object(fake_redis, "pipeline", wraps=fake_redis.pipeline) as pipeline:
+            result = tasks._publish_to_redis("job-123", "optimizing", 50, "Halfway")
+        
+        assert result is True
+        assert pipeline.call_count == 1  # One round trip
+        
+        # Job channel + all channel (subscribe confirmations come back as None)
+        messages = []
+        for _ in range(5):
+            message = pubsub.get_message(timeout=0.1)
+            if message:
+                messages.append(message)
+            if len(messages) == 2:
+                break
+        pubsub.close()
+        assert len(messages) == 2
+        assert {m["channel"] for m in messages} == {b"job_progress:job-123", b"job_progress:all"}
+        for m in messages:
+            data = json.loads(m["data"])
+            assert data["job_id"] == "job-123"
+            assert data["progress"] == 50
     
-    @patch("tasks.redis.Redis")
-    def test_publish_to_redis_failure(self, mock_redis_class):
+    def test_publish_to_redis_failure(self, fake_redis_server, redis_client):
         """Test handling when Redis is unavailable."""
+        fake_redis_server.connected = False
         try:
-            from tasks import _publish_to_redis
-            
-            # Mock Redis to raise exception
-            mock_redis_class.from_url.side_effect = Exception("Redis down")
-            
-            result = _publish_to_redis("job-123", "optimizing", 50, "Halfway")
-            
-            assert result is False
-        except ImportError:
-            pytest.skip("Tasks not available")
+            result = tasks._publish_to_redis("job-123", "optimizing", 50, "Halfway")
+        finally:
+            fake_redis_server.connected = True
+        
+        assert result is False
+        # The broken client is dropped so the next publish reconnects
+        redis_client.cache_clear.assert_called_once()
     
     def test_publish_to_redis_when_redis_disabled(self):
         """Test that publish returns False when Redis is not available."""
-        try:
-            from tasks import _publish_to_redis
-            from config import config
-            
-            with patch.object(config, "is_redis_available", return_value=False):
-                result = _publish_to_redis("job-123", "optimizing", 50, "Halfway")
-            
-            assert result is False
-        except ImportError:
-            pytest.skip("Tasks or config not available")
+        with patch.object(config, "is_redis_available", return_value=False):
+            result = tasks._publish_to_redis("job-123", "optimizing", 50, "Halfway")
+        
+        assert result is False
 
 
 # ============================================================
@@ -323,113 +411,129 @@ class TestOptimizeTaskExecution:
     @pytest.fixture(autouse=True)
     def celery_eager_mode(self):
         """Configure Celery for eager execution."""
-        try:
-            from celery_app import celery_app
-            original_always_eager = celery_app.conf.task_always_eager
-            celery_app.conf.task_always_eager = True
-            celery_app.conf.task_store_eager_result = True
-            yield
-            celery_app.conf.task_always_eager = original_always_eager
-        except ImportError:
-            yield
+        original_always_eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        celery_app.conf.task_store_eager_result = True
+        yield
+        celery_app.conf.task_always_eager = original_always_eager
     
-    @pytest.mark.skipif(
-        not pytest.importorskip("celery", reason="Celery not installed"),
-        reason="Celery not installed"
-    )
-    def test_optimize_task_runs_with_valid_data(self, sample_routes_data):
+    @pytest.fixture
+    def stub_optimizer(self):
+        """
+        Replace optimize_v6 with a stub that puts each route on its own bus.
+
+        Keeps these tests on the Celery plumbing (state updates, stats,
+        serialization); the real optimizer run is covered by
+        ``test_optimize_task_end_to_end``.
+        """
+        from models import BusSchedule, ScheduleItem
+
+        def fake_optimize_v6(routes, progress_callback=None, **kwargs):
+            if progress_callback:
+                progress_callback("optimizing", 50, "Stub optimizer")
+            return [
+                BusSchedule(
+                    bus_id=f"B{i:03d}",
+                    items=[
+                        ScheduleItem(
+                            route_id=route.id,
+                            start_time=route.arrival_time or route.departure_time,
+                            end_time=route.arrival_time or route.departure_time,
+                            type=route.type,
+                        )
+                    ],
+                )
+                for i, route in enumerate(routes)
+            ]
+
+        with patch("tasks.optimize_v6", side_effect=fake_optimize_v6) as mocked:
+            yield mocked
+    
+    @pytest.mark.skipif(not HAS_CELERY, reason="Celery not installed")
+    def test_optimize_task_runs_with_valid_data(self, stub_optimizer, sample_routes_data):
         """Test that optimize_task runs successfully with valid data."""
-        try:
-            from tasks import optimize_task
-            
-            job_id = str(uuid.uuid4())
-            
-            # Run task synchronously (eager mode)
-            result = optimize_task.run(
-                routes_data=sample_routes_data,
-                job_id=job_id
-            )
-            
-            # Verify result structure
-            assert isinstance(result, dict)
-            assert "schedule" in result
-            assert "stats" in result
-            assert isinstance(result["schedule"], list)
-            assert isinstance(result["stats"], dict)
-            
-        except ImportError:
-            pytest.skip("Tasks not available")
+        job_id = str(uuid.uuid4())
+        
+        # Run task synchronously (eager mode)
+        result = tasks.optimize_task.run(
+            routes_data=sample_routes_data,
+            job_id=job_id
+        )
+        
+        # Verify result structure
+        assert isinstance(result, dict)
+        assert "schedule" in result
+        assert "stats" in result
+        assert isinstance(result["schedule"], list)
+        assert isinstance(result["stats"], dict)
+        assert stub_optimizer.call_count == 1
     
-    @pytest.mark.skipif(
-        not pytest.importorskip("celery", reason="Celery not installed"),
-        reason="Celery not installed"
-    )
-    def test_optimize_task_calculates_stats(self, sample_routes_data):
+    @pytest.mark.skipif(not HAS_CELERY, reason="Celery not installed")
+    def test_optimize_task_calculates_stats(self, stub_optimizer, sample_routes_data):
         """Test that optimize_task calculates statistics."""
-        try:
-            from tasks import optimize_task
-            
-            job_id = str(uuid.uuid4())
-            
-            result = optimize_task.run(
-                routes_data=sample_routes_data,
-                job_id=job_id
-            )
-            
-            stats = result["stats"]
-            assert "total_buses" in stats
-            assert "total_routes" in stats
-            assert "total_entries" in stats
-            assert "total_exits" in stats
-            
-            # Verify stats are reasonable
-            assert stats["total_routes"] == len(sample_routes_data)
-            assert stats["total_entries"] + stats["total_exits"] == len(sample_routes_data)
-            
-        except ImportError:
-            pytest.skip("Tasks not available")
+        job_id = str(uuid.uuid4())
+        
+        result = tasks.optimize_task.run(
+            routes_data=sample_routes_data,
+            job_id=job_id
+        )
+        
+        stats = result["stats"]
+        assert "total_buses" in stats
+        assert "total_routes" in stats
+        assert "total_entries" in stats
+        assert "total_exits" in stats
+        
+        # Verify stats are reasonable
+        assert stats["total_routes"] == len(sample_routes_data)
+        assert stats["total_entries"] + stats["total_exits"] == len(sample_routes_data)
     
-    def test_optimize_task_progress_reporting(self, sample_routes_data):
+    def test_optimize_task_progress_reporting(self, stub_optimizer, sample_routes_data):
         """Test that optimize_task reports progress updates."""
-        try:
-            from tasks import optimize_task
-            
-            job_id = str(uuid.uuid4())
-            progress_updates = []
-            
-            # Mock the task's update_state method
-            def mock_update_state(state=None, meta=None):
-                if state == "PROGRESS":
-                    progress_updates.append(meta)
-            
-            # Run with mocked update_state
-            task = optimize_task.bind()
-            task.update_state = mock_update_state
-            
-            result = task.run(
+        job_id = str(uuid.uuid4())
+        progress_updates = []
+        
+        # Mock the task's update_state method
+        def mock_update_state(state=None, meta=None):
+            if state == "PROGRESS":
+                progress_updates.append(meta)
+        
+        # Run with mocked update_state
+        with patch.object(tasks.optimize_task, "update_state", side_effect=mock_update_state):
+            tasks.optimize_task.run(
                 routes_data=sample_routes_data,
                 job_id=job_id
             )
-            
-            # Verify we received progress updates
-            assert len(progress_updates) > 0
-            
-            # Check structure of progress updates
-            for update in progress_updates:
-                assert "phase" in update
-                assert "progress" in update
-                assert "message" in update
-                assert "job_id" in update
-                assert isinstance(update["progress"], int)
-                assert 0 <= update["progress"] <= 100
-            
-            # Verify we got start and end progress
-            progresses = [u["progress"] for u in progress_updates]
-            assert 0 in progresses
-            assert 100 in progresses or max(progresses) >= 95
-            
-        except ImportError:
-            pytest.skip("Tasks not available")
+        
+        # Verify we received progress updates
+        assert len(progress_updates) > 0
+        
+        # Check structure of progress updates
+        for update in progress_updates:
+            assert "phase" in update
+            assert "progress" in update
+            assert "message" in update
+            assert "job_id" in update
+            assert isinstance(update["progress"], int)
+            assert 0 <= update["progress"] <= 100
+        
+        # Verify we got start and end progress
+        progresses = [u["progress"] for u in progress_updates]
+        assert 0 in progresses
+        assert 100 in progresses or max(progresses) >= 95
+    
+    @pytest.mark.slow
+    @pytest.mark.integration
+    def test_optimize_task_end_to_end(self, sample_routes_data):
+        """Run the real optimizer through optimize_task."""
+        result = tasks.optimize_task.run(
+            routes_data=sample_routes_data,
+            job_id=str(uuid.uuid4())
+        )
+        
+        stats = result["stats"]
+        assert stats["total_routes"] == len(sample_routes_data)
+        assert stats["total_buses"] >= 1
 
 
 # ============================================================
@@ -441,57 +545,39 @@ class TestErrorHandling:
     
     def test_optimize_task_with_invalid_data(self):
         """Test task behavior with invalid input data."""
-        try:
-            from tasks import optimize_task
-            
-            job_id = str(uuid.uuid4())
+        job_id = str(uuid.uuid4())
+        
+        # Test with None data - should raise exception and trigger retry
+        with patch.object(tasks.optimize_task, "retry", side_effect=_RetryTriggered) as retry:
+            with pytest.raises(_RetryTriggered):
+                tasks.optimize_task.run(routes_data=None, job_id=job_id)
+        
+        assert isinstance(retry.call_args[1]["exc"], TypeError)
+        assert retry.call_args[1]["countdown"] == tasks._RETRY_COUNTDOWNS[0]
             
-            # Test with None data - should raise exception and trigger retry
-            with pytest.raises(Exception):
-                optimize_task.run(routes_data=None, job_id=job_id)
-                
-        except ImportError:
-            pytest.skip("Tasks not available")
     
     def test_optimize_task_with_empty_routes(self):
         """Test task behavior with empty routes list."""
-        try:
-            from tasks import optimize_task
-            
-            job_id = str(uuid.uuid4())
-            
-            # Run with empty routes
-            result = optimize_task.run(routes_data=[], job_id=job_id)
-            
-            # Should return empty schedule
-            assert result["schedule"] == []
-            assert result["stats"]["total_buses"] == 0
-            assert result["stats"]["total_routes"] == 0
-            
-        except ImportError:
-            pytest.skip("Tasks not available")
+        job_id = str(uuid.uuid4())
+        
+        # Run with empty routes
+        result = tasks.optimize_task.run(routes_data=[], job_id=job_id)
+        
+        # Should return empty schedule
+        assert result["schedule"] == []
+        assert result["stats"]["total_buses"] == 0
+        assert result["stats"]["total_routes"] == 0
     
     def test_retry_countdown_calculation(self):
         """Test that retry countdown increases with each retry."""
-        try:
-            from tasks import optimize_task
-            
-            # Check the retry logic in the except block
-            # retry_count = self.request.retries
-            # countdown = 60 * (2 ** retry_count)
-            # 
-            # First retry: 60 * (2^0) = 60s
-            # Second retry: 60 * (2^1) = 120s
-            # Third retry: 60 * (2^2) = 240s
-            
-            expected_countdowns = [60, 120, 240]
-            
-            for retry_count, expected in enumerate(expected_countdowns):
-                actual = 60 * (2 ** retry_count)
-                assert actual == expected
-                
-        except ImportError:
-            pytest.skip("Tasks not available")
+        # First retry: 60s, second: 120s, third: 240s (+ the exhausted call)
+        assert len(tasks._RETRY_COUNTDOWNS) == tasks.optimize_task.max_retries + 1
+        for retry_count, countdown in enumerate(tasks._RETRY_COUNTDOWNS):
+            assert countdown == 60 * (2 ** retry_count)
+        
+        assert len(tasks._PIPELINE_RETRY_COUNTDOWNS) == tasks.optimize_pipeline_task.max_retries + 1
+        for retry_count, countdown in enumerate(tasks._PIPELINE_RETRY_COUNTDOWNS):
+            assert countdown == 30 * (2 ** retry_count)
 
 
 # ============================================================
@@ -502,103 +588,84 @@ class TestErrorHandling:
 class TestDatabaseIntegration:
     """Test database integration with Celery tasks."""
     
-    @pytest.fixture
-    def db_session(self):
-        """Create a database session for testing."""
-        try:
-            from db.database import SessionLocal, is_database_available
-            
-            if not is_database_available():
-                pytest.skip("Database not available")
-            
-            db = SessionLocal()
-            yield db
-            db.close()
-        except ImportError:
-            pytest.skip("Database not available")
-    
     def test_job_status_updated_to_running(self, db_session, sample_routes_data):
         """Test that job status is updated to running during task execution."""
-        try:
-            from tasks import optimize_task
-            from db.models import OptimizationJob
-            from datetime import datetime
-            
-            job_id = str(uuid.uuid4())
-            
-            # Create job in database
-            job = OptimizationJob(
-                id=job_id,
-                status="queued",
-                algorithm="v6",
-                input_data=sample_routes_data,
-                created_at=datetime.utcnow()
-            )
-            db_session.add(job)
-            db_session.commit()
-            
-            # Run task
-            result = optimize_task.run(
-                routes_data=sample_routes_data,
-                job_id=job_id
-            )
-            
-            # Refresh job from database
-            db_session.refresh(job)
-            
-            # Verify job was updated
-            assert job.status == "completed"
-            assert job.result is not None
-            assert job.stats is not None
-            assert job.completed_at is not None
-            
-            # Clean up
-            db_session.delete(job)
-            db_session.commit()
-            
-        except ImportError:
-            pytest.skip("Tasks or database not available")
+        from db.models import OptimizationJob
+        from datetime import datetime
+        
+        job_id = str(uuid.uuid4())
+        
+        # Create job in database
+        job = OptimizationJob(
+            id=job_id,
+            status="queued",
+            algorithm="v6",
+            input_data=sample_routes_data,
+            created_at=datetime.utcnow()
+        )
+        db_session.add(job)
+        db_session.commit()
+        
+        # Run task
+        result = tasks.optimize_task.run(
+            routes_data=sample_routes_data,
+            job_id=job_id
+        )
+        
+        # Refresh job from database
+        db_session.refresh(job)
+        
+        # Verify job was updated
+        assert job.status == "completed"
+        assert job.result is not None
+        assert job.stats is not None
+        assert job.completed_at is not None
     
     def test_job_result_saved(self, db_session, sample_routes_data):
         """Test that job result is saved to database."""
-        try:
-            from tasks import optimize_task
-            from db.models import OptimizationJob
-            from datetime import datetime
-            
-            job_id = str(uuid.uuid4())
-            
-            # Create job
-            job = OptimizationJob(
-                id=job_id,
-                status="queued",
-                algorithm="v6",
-                input_data=sample_routes_data,
-                created_at=datetime.utcnow()
-            )
-            db_session.add(job)
-            db_session.commit()
-            
-            # Run task
-            result = optimize_task.run(
-                routes_data=sample_routes_data,
-                job_id=job_id
-            )
-            
-            # Verify result was saved
-            db_session.refresh(job)
-            assert job.result is not None
-            assert "schedule" in job.result
-            assert "stats" in job.result
-            assert job.stats is not None
-            assert "total_buses" in job.stats
-            
-            # Clean up
-            db_session.delete(job)
-            db_session.commit()
-            
-        except ImportError:
-            pytest.skip("Tasks or database not available")
+        from db.models import OptimizationJob
+        from datetime import datetime
+        
+        job_id = str(uuid.uuid4())
+        
+        # Create job
+        job = OptimizationJob(
+            id=job_id,
+            status="queued",
+            algorithm="v6",
+            input_data=sample_routes_data,
+            created_at=datetime.utcnow()
+        )
+        db_session.add(job)
+        db_session.commit()
+        
+        # Run task
+        result = tasks.optimize_task.run(
+            routes_data=sample_routes_data,
+            job_id=job_id
+        )
+        
+        # Verify result was saved
+        db_session.refresh(job)
+        assert job.result is not None
+        assert "schedule" in job.result
+        assert "stats" in job.result
+        assert job.stats is not None
+        assert "total_buses" in job.stats
+
+    def test_update_job_reports_missing_job(self, db_session):
+        """Test that _update_job applies the transition and reports missing jobs."""
+        from db.models import OptimizationJob
+        
+        job_id = str(uuid.uuid4())
+        db_session.add(OptimizationJob(id=job_id, status="queued", algorithm="v6"))
+        db_session.commit()
+        
+        assert tasks._update_job(db_session, job_id, status="running") is True
+        assert tasks._update_job(db_session, str(uuid.uuid4()), status="running") is False
+        
+        db_session.expire_all()
+        assert db_session.get(OptimizationJob, job_id).status == "running"
 
 
 # ============================================================
@@ -610,71 +677,98 @@ class TestCleanupTask:
     
     def test_cleanup_task_import(self):
         """Test that cleanup task can be imported."""
-        try:
-            from tasks import cleanup_old_jobs
-            assert callable(cleanup_old_jobs)
-        except ImportError:
-            pytest.skip("Tasks not available")
+        assert callable(tasks.cleanup_old_jobs)
     
     @pytest.mark.integration
     def test_cleanup_old_jobs(self, db_session):
         """Test cleanup of old jobs."""
-        try:
-            from tasks import cleanup_old_jobs
-            from db.models import OptimizationJob
-            from datetime import datetime, timedelta
-            
-            # Create old completed job
-            old_job = OptimizationJob(
-                id=uuid.uuid4(),
-                status="completed",
-                algorithm="v6",
-                created_at=datetime.utcnow() - timedelta(hours=48),
-                completed_at=datetime.utcnow() - timedelta(hours=47)
-            )
-            db_session.add(old_job)
-            
-            # Create recent completed job
-            recent_job = OptimizationJob(
-                id=uuid.uuid4(),
-                status="completed",
-                algorithm="v6",
-                created_at=datetime.utcnow() - timedelta(hours=12),
-                completed_at=datetime.utcnow() - timedelta(hours=11)
-            )
-            db_session.add(recent_job)
-            
-            # Create old running job (should not be cleaned)
-            running_job = OptimizationJob(
-                id=uuid.uuid4(),
-                status="running",
-                algorithm="v6",
-                created_at=datetime.utcnow() - timedelta(hours=48)
+        from db.models import OptimizationJob
+        from datetime import datetime, timedelta
+        
+        now = datetime.utcnow()
+        # Old completed job (should be cleaned)
+        old_job = OptimizationJob(
+            id=str(uuid.uuid4()),
+            status="completed",
+            algorithm="v6",
+            created_at=now - timedelta(hours=48),
+            completed_at=now - timedelta(hours=47)
+        )
+        # Recent completed job
+        recent_job = OptimizationJob(
+            id=str(uuid.uuid4()),
+            status="completed",
+            algorithm="v6",
+            created_at=now - timedelta(hours=12),
+            completed_at=now - timedelta(hours=11)
+        )
+        # Old running job (should not be cleaned)
+        running_job = OptimizationJob(
+            id=str(uuid.uuid4()),
+            status="running",
+            algorithm="v6",
+            created_at=now - timedelta(hours=48)
+        )
+        db_session.add_all([old_job, recent_job, running_job])
+        db_session.commit()
+        old_id, recent_id, running_id = old_job.id, recent_job.id, running_job.id
+        
+        # Run cleanup (tasks.SessionLocal is bound to this test's connection)
+        result = tasks.cleanup_old_jobs.run(max_age_hours=24)
+        
+        # Verify cleanup stats
+        assert result["cleaned"] == 1
+        assert result["max_age_hours"] == 24
+        
+        db_session.expire_all()
+        # Verify old completed job was deleted
+        assert db_session.get(OptimizationJob, old_id) is None
+        
+        # Verify recent job and running job still exist
+        assert db_session.get(OptimizationJob, recent_id) is not None
+        assert db_session.get(OptimizationJob, running_id) is not None
+    
+    @pytest.mark.integration
+    def test_cleanup_old_jobs_removes_results(self, db_session):
+        """Test that the set-based cleanup drops old jobs with their results only."""
+        from db.models import OptimizationJob, OptimizationResultModel
+        from datetime import datetime, timedelta
+        
+        now = datetime.utcnow()
+        old = now - timedelta(hours=48)
+        jobs = {
+            "old_completed": OptimizationJob(id=str(uuid.uuid4()), status="completed", algorithm="v6", created_at=old),
+            "old_failed": OptimizationJob(id=str(uuid.uuid4()), status="failed", algorithm="v6", created_at=old),
+            "old_running": OptimizationJob(id=str(uuid.uuid4()), status="running", algorithm="v6", created_at=old),
+            "recent": OptimizationJob(
+                id=str(uuid.uuid4()), status="completed", algorithm="v6",
+                created_at=now - timedelta(hours=1),
+            ),
+        }
+        db_session.add_all(jobs.values())
+        db_session.add_all(
+            OptimizationResultModel(
+                job_id=job.id,
+                bus_id=f"B{n:03d}",
+                start_time=time(8, 0),
+                end_time=time(8, 30),
             )
-            db_session.add(running_job)
-            db_session.commit()
-            
-            # Run cleanup
-            result = cleanup_old_jobs.run(max_age_hours=24)
-            
-            # Verify cleanup stats
-            assert result["cleaned"] == 1
-            assert result["max_age_hours"] == 24
-            
-            # Verify old completed job was deleted
-            assert db_session.query(OptimizationJob).filter_by(id=old_job.id).first() is None
-            
-            # Verify recent job and running job still exist
-            assert db_session.query(OptimizationJob).filter_by(id=recent_job.id).first() is not None
-            assert db_session.query(OptimizationJob).filter_by(id=running_job.id).first() is not None
-            
-            # Clean up
-            db_session.delete(recent_job)
-            db_session.delete(running_job)
-            db_session.commit()
-            
-        except ImportError:
-            pytest.skip("Tasks or database not available")
+            for n, job in enumerate(jobs.values())
+            for _ in range(2)
+        )
+        db_session.commit()
+        job_ids = {name: job.id for name, job in jobs.items()}
+        
+        result = tasks.cleanup_old_jobs.run(max_age_hours=24)
+        
+        assert result == {"cleaned": 2, "max_age_hours": 24}
+        db_session.expire_all()
+        remaining_jobs = {job_id for (job_id,) in db_session.query(OptimizationJob.id)}
+        remaining_results = [
+            job_id for (job_id,) in db_session.query(OptimizationResultModel.job_id)
+        ]
+        assert remaining_jobs == {job_ids["old_running"], job_ids["recent"]}
+        assert sorted(remaining_results) == sorted([job_ids["old_running"], job_ids["recent"]] * 2)
 
 
 # ============================================================
@@ -686,35 +780,25 @@ class TestStatsCalculation:
     
     def test_calculate_stats_with_empty_schedule(self):
         """Test stats calculation with empty schedule."""
-        try:
-            from tasks import _calculate_stats
-            
-            stats = _calculate_stats([])
-            
-            assert stats["total_buses"] == 0
-            assert stats["total_routes"] == 0
-            assert stats["total_entries"] == 0
-            assert stats["total_exits"] == 0
-            assert stats["max_entries_per_bus"] == 0
-            assert stats["max_exits_per_bus"] == 0
-            assert stats["buses_with_both"] == 0
-            assert stats["avg_routes_per_bus"] == 0
-            assert stats["total_early_shift_minutes"] == 0
-            
-        except ImportError:
-            pytest.skip("Tasks not available")
+        stats = tasks._calculate_stats([])
+        
+        assert stats["total_buses"] == 0
+        assert stats["total_routes"] == 0
+        assert stats["total_entries"] == 0
+        assert stats["total_exits"] == 0
+        assert stats["max_entries_per_bus"] == 0
+        assert stats["max_exits_per_bus"] == 0
+        assert stats["buses_with_both"] == 0
+        assert stats["avg_routes_per_bus"] == 0
+        assert stats["total_early_shift_minutes"] == 0
     
     def test_calculate_stats_with_schedule(self, sample_bus_schedule):
         """Test stats calculation with actual schedule."""
-        try:
-            from tasks import _calculate_stats
-            from models import BusSchedule
-            
-            stats = _calculate_stats([sample_bus_schedule])
-            
-            assert stats["total_buses"] == 1
-            assert stats["total_routes"] >= 1
-            assert stats["avg_routes_per_bus"] >= 1.0
-            
-        except ImportError:
-            pytest.skip("Tasks not available")
+        from models import BusSchedule
+        
+        stats = tasks._calculate_stats([sample_bus_schedule])
+        
+        assert stats["total_buses"] == 1
+        assert stats["total_routes"] >= 1
+        assert stats["avg_routes_per_bus"] >= 1.0
+        
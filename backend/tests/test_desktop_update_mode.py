@@ -3,32 +3,48 @@ import sys
 import types
 from pathlib import Path
 
+import pytest
 
-def _load_desktop_launcher():
-    module_name = "desktop_launcher_test_module"
-    launcher_path = (
-        Path(__file__).resolve().parents[2] / "scripts" / "desktop" / "desktop_launcher.py"
-    )
 
-    # Stub pywebview to avoid GUI dependency during tests.
+MODULE_NAME = "desktop_launcher_test_module"
+
+
+def _fake_webview() -> types.ModuleType:
+    """Stub pywebview to avoid GUI dependency during tests."""
     fake_webview = types.ModuleType("webview")
     fake_webview.SAVE_DIALOG = 1
     fake_webview.create_window = lambda *args, **kwargs: None
     fake_webview.start = lambda *args, **kwargs: None
-    sys.modules["webview"] = fake_webview
+    return fake_webview
 
-    if module_name in sys.modules:
-        del sys.modules[module_name]
 
-    spec = importlib.util.spec_from_file_location(module_name, launcher_path)
+def _load_desktop_launcher():
+    launcher_path = (
+        Path(__file__).resolve().parents[2] / "scripts" / "desktop" / "desktop_launcher.py"
+    )
+    spec = importlib.util.spec_from_file_location(MODULE_NAME, launcher_path)
     module = importlib.util.module_from_spec(spec)
     assert spec and spec.loader
     spec.loader.exec_module(module)
     return module
 
 
-def test_update_mode_onedir_requires_installer():
-    launcher = _load_desktop_launcher()
+@pytest.fixture(scope="session")
+def launcher():
+    """
+    desktop_launcher module, executed once; tests only call its pure helpers.
+
+    The pywebview stub and the loaded module live in ``sys.modules`` only
+    while the fixture is active, and both are removed on teardown.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setitem(sys.modules, "webview", _fake_webview())
+        module = _load_desktop_launcher()
+        mp.setitem(sys.modules, MODULE_NAME, module)
+        yield module
+
+
+def test_update_mode_onedir_requires_installer(launcher):
     installer_asset = {"name": "TuttiSetup.exe"}
     portable_asset = {"name": "TuttiDesktopApp.zip"}
 
@@ -43,8 +59,7 @@ def test_update_mode_onedir_requires_installer():
     assert asset == installer_asset
 
 
-def test_update_mode_portable_requires_zip():
-    launcher = _load_desktop_launcher()
+def test_update_mode_portable_requires_zip(launcher):
     installer_asset = {"name": "TuttiSetup.exe"}
     portable_asset = {"name": "TuttiDesktopApp.zip"}
 
@@ -59,8 +74,7 @@ def test_update_mode_portable_requires_zip():
     assert asset == portable_asset
 
 
-def test_update_mode_portable_blocks_when_zip_missing():
-    launcher = _load_desktop_launcher()
+def test_update_mode_portable_blocks_when_zip_missing(launcher):
     installer_asset = {"name": "TuttiSetup.exe"}
 
     asset, update_mode, block_reason = launcher._resolve_update_asset_for_mode(
@@ -74,8 +88,7 @@ def test_update_mode_portable_blocks_when_zip_missing():
     assert block_reason == "portable_asset_missing"
 
 
-def test_update_mode_onedir_blocks_when_installer_missing():
-    launcher = _load_desktop_launcher()
+def test_update_mode_onedir_blocks_when_installer_missing(launcher):
     portable_asset = {"name": "TuttiDesktopApp.zip"}
 
     asset, update_mode, block_reason = launcher._resolve_update_asset_for_mode(
@@ -89,8 +102,7 @@ def test_update_mode_onedir_blocks_when_installer_missing():
     assert block_reason == "installer_asset_missing"
 
 
-def test_select_portable_asset_prefers_zip_and_ignores_exe_only():
-    launcher = _load_desktop_launcher()
+def test_select_portable_asset_prefers_zip_and_ignores_exe_only(launcher):
     release_with_zip = {
         "assets": [
             {"name": "TuttiSetup.exe"},
@@ -5,51 +5,60 @@ API tests for ML assignment toggle and A/B comparison endpoint.
 from datetime import time
 from typing import Any, Dict, List
 
-from fastapi.testclient import TestClient
-
 from models import BusSchedule, ScheduleItem, Stop
 
 
+# Trusted fixture data: built once, without Pydantic validation, and shared
+# by every ScheduleItem that _make_schedule returns.
+_STOPS: List[Stop] = [
+    Stop.model_construct(
+        name="Stop",
+        lat=42.24,
+        lon=-8.72,
+        order=1,
+        time_from_start=0,
+        passengers=5,
+        is_school=False,
+    ),
+    Stop.model_construct(
+        name="School",
+        lat=42.25,
+        lon=-8.73,
+        order=2,
+        time_from_start=20,
+        passengers=0,
+        is_school=True,
+    ),
+]
+
+
 def _make_schedule(bus_count: int) -> List[BusSchedule]:
-    schedules: List[BusSchedule] = []
-    for idx in range(bus_count):
-        item = ScheduleItem(
-            route_id=f"R{idx:03d}",
-            start_time=time(8, 0),
-            end_time=time(8, 20),
-            type="entry",
-            school_name="School Test",
-            stops=[
-                Stop(
-                    name="Stop",
-                    lat=42.24,
-                    lon=-8.72,
-                    order=1,
-                    time_from_start=0,
-                    passengers=5,
-                    is_school=False,
-                ),
-                Stop(
-                    name="School",
-                    lat=42.25,
-                    lon=-8.73,
-                    order=2,
-                    time_from_start=20,
-                    passengers=0,
-                    is_school=True,
-                ),
+    return [
+        BusSchedule.model_construct(
+            bus_id=f"B{idx + 1:03d}",
+            items=[
+                ScheduleItem.model_construct(
+                    route_id=f"R{idx:03d}",
+                    start_time=time(8, 0),
+                    end_time=time(8, 20),
+                    type="entry",
+                    school_name="School Test",
+                    stops=_STOPS,
+                    contract_id="CNT",
+                    original_start_time=time(8, 20),
+                    time_shift_minutes=0,
+                    deadhead_minutes=0,
+                )
             ],
-            contract_id="CNT",
-            original_start_time=time(8, 20),
-            time_shift_minutes=0,
-            deadhead_minutes=0,
         )
-        schedules.append(BusSchedule(bus_id=f"B{idx + 1:03d}", items=[item]))
-    return schedules
+        for idx in range(bus_count)
+    ]
+
+
+# ``async_client`` (conftest.py) is an httpx.AsyncClient over ASGITransport.
 
 
-def test_optimize_v6_forwards_use_ml_assignment_flag(monkeypatch):
-    from main import app
+async def test_optimize_v6_forwards_use_ml_assignment_flag(async_client, monkeypatch):
     import optimizer_v6
 
     captured: Dict[str, Any] = {"use_ml_assignment": None}
@@ -68,8 +77,7 @@ def test_optimize_v6_forwards_use_ml_assignment_flag(monkeypatch):
 
     monkeypatch.setattr(optimizer_v6, "optimize_v6", fake_optimize_v6)
 
-    client = TestClient(app)
-    response = client.post("/optimize-v6?use_ml_assignment=false", json=[])
+    response = await async_client.post("/optimize-v6?use_ml_assignment=false", json=[])
 
     assert response.status_code == 200
     data = response.json()
@@ -78,8 +86,7 @@ def test_optimize_v6_forwards_use_ml_assignment_flag(monkeypatch):
     assert data["optimization_options"]["use_ml_assignment"] is False
 
 
-def test_optimize_v6_ab_returns_deltas_and_recommendation(monkeypatch):
-    from main import app
+async def test_optimize_v6_ab_returns_deltas_and_recommendation(async_client, monkeypatch):
     import optimizer_v6
 
     def fake_optimize_v6(
@@ -96,8 +103,7 @@ def test_optimize_v6_ab_returns_deltas_and_recommendation(monkeypatch):
 
     monkeypatch.setattr(optimizer_v6, "optimize_v6", fake_optimize_v6)
 
-    client = TestClient(app)
-    response = client.post("/optimize-v6-ab", json=[])
+    response = await async_client.post("/optimize-v6-ab", json=[])
 
     assert response.status_code == 200
     data = response.json()
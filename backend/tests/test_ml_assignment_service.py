@@ -1,10 +1,27 @@
+import statistics
+import time
 from dataclasses import dataclass
 from typing import Dict, Tuple
 
+import pytest
+
 try:
-    from backend.services.ml_assignment_service import build_ml_pair_scores
+    from backend.services.ml_assignment_service import (
+        _build_pair_rows,
+        _build_pair_rows_matrix,
+        build_ml_pair_scores,
+    )
 except ImportError:
-    from services.ml_assignment_service import build_ml_pair_scores
+    from services.ml_assignment_service import (
+        _build_pair_rows,
+        _build_pair_rows_matrix,
+        build_ml_pair_scores,
+    )
+
+BENCHMARK_JOBS = 200
+BENCHMARK_ROUNDS = 5
+# Median budget for building all N*(N-1) pair feature rows from the matrix.
+BENCHMARK_BUDGET_SECONDS = 0.5
 
 
 @dataclass
@@ -71,3 +88,81 @@ def test_ml_pair_scores_prioritizes_healthier_buffer_transitions():
 
     assert scores[(0, 1)] > scores[(0, 2)]
 
+
+@pytest.mark.parametrize("is_entry", [True, False], ids=["entry", "exit"])
+def test_ml_pair_scores_matrix_equivalence(is_entry):
+    np = pytest.importorskip("numpy")
+    jobs = [
+        DummyJob(time_minutes=480, duration_minutes=20, school_name="A", route_type="entry"),
+        DummyJob(time_minutes=520, duration_minutes=20, school_name="A", route_type="entry"),
+        DummyJob(time_minutes=500, duration_minutes=25, school_name="B", route_type="exit"),
+        DummyJob(time_minutes=545, duration_minutes=0, school_name="C", route_type="exit"),
+    ]
+    # (3, 0) is missing on purpose: both paths must treat it as 999 min.
+    tt: Dict[Tuple[int, int], int] = {
+        (i, j): 5 + ((3 * i + 7 * j) % 25)
+        for i in range(len(jobs))
+        for j in range(len(jobs))
+        if i != j and (i, j) != (3, 0)
+    }
+    matrix = np.full((len(jobs), len(jobs)), np.nan)
+    for (i, j), minutes in tt.items():
+        matrix[i, j] = minutes
+
+    kwargs = dict(
+        is_entry=is_entry,
+        min_buffer_minutes=5.0,
+        max_early_arrival_minutes=5,
+        max_exit_shift_minutes=5,
+        min_start_hour=6,
+    )
+    from_dict = build_ml_pair_scores(jobs, tt, **kwargs)
+    from_matrix = build_ml_pair_scores(jobs, {}, travel_time_matrix=matrix, **kwargs)
+
+    assert from_matrix == from_dict
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_ml_pair_scores_benchmark():
+    """Guard the vectorized pair-feature build at N=200 against regressions.
+
+    Only feature construction is timed: SGD training is sequential by design
+    and takes seconds at this size.
+    """
+    np = pytest.importorskip("numpy")
+    n = BENCHMARK_JOBS
+    jobs = [
+        DummyJob(
+            time_minutes=420 + (i * 7) % 240,
+            duration_minutes=15 + (i % 4) * 5,
+            school_name=f"S{i % 10}",
+            route_type="entry",
+        )
+        for i in range(n)
+    ]
+    tt_matrix = np.fromfunction(lambda i, j: 5 + (3 * i + 7 * j) % 25, (n, n))
+    np.fill_diagonal(tt_matrix, np.nan)
+    tt = {(i, j): int(tt_matrix[i, j]) for i in range(n) for j in range(n) if i != j}
+    kwargs = dict(
+        is_entry=True,
+        min_buffer_minutes=5.0,
+        max_early_arrival_minutes=0,
+        max_exit_shift_minutes=0,
+        min_start_hour=6,
+    )
+
+    def median_seconds(build, source):
+        samples = []
+        for _ in range(BENCHMARK_ROUNDS):
+            start = time.perf_counter()
+            rows = build(jobs, source, **kwargs)
+            samples.append(time.perf_counter() - start)
+        assert len(rows) == n * (n - 1)
+        return statistics.median(samples)
+
+    matrix_seconds = median_seconds(_build_pair_rows_matrix, tt_matrix)
+    dict_seconds = median_seconds(_build_pair_rows, tt)
+
+    assert matrix_seconds < BENCHMARK_BUDGET_SECONDS
+    assert matrix_seconds < dict_seconds
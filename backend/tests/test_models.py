@@ -1,6 +1,8 @@
 """
 Tests for Pydantic models (Stop, Route, BusSchedule, etc.)
 """
+import copy
+
 import pytest
 from datetime import time
 from typing import List
@@ -74,12 +76,19 @@ class TestStop:
         )
         assert stop.passengers == -5
     
-    def test_stop_serialization(self, sample_stop):
+    @pytest.fixture(scope="class")
+    def stop_dump(self, sample_stop):
+        """Serialize the sample stop once for every field check."""
+        return sample_stop.model_dump()
+    
+    @pytest.mark.parametrize("field,value", [
+        ("name", "Test Stop"),
+        ("lat", 42.2406),
+        ("passengers", 10),
+    ])
+    def test_stop_serialization(self, stop_dump, field, value):
         """Test stop serialization to dict."""
-        data = sample_stop.model_dump()
-        assert data["name"] == "Test Stop"
-        assert data["lat"] == 42.2406
-        assert data["passengers"] == 10
+        assert stop_dump[field] == value
     
     def test_stop_json_serialization(self, sample_stop):
         """Test stop JSON serialization."""
@@ -115,6 +124,38 @@ class TestRoute:
         # 5 + 8 + 7 + 0 = 20
         assert entry_route.num_students == 20
     
+    def test_route_num_students_cached(self, entry_route):
+        """Test num_students is summed once and reused on later accesses."""
+        route = entry_route.model_copy()
+        route.__dict__.pop("num_students", None)
+        
+        first = route.num_students
+        assert route.__dict__["num_students"] == 20
+        assert route.num_students is first
+    
+    def test_route_num_students_recomputed_on_new_stops(self, entry_route, multiple_stops):
+        """Test replacing stops drops the cached num_students."""
+        route = entry_route.model_copy()
+        assert route.num_students == 20
+        
+        assert route.model_copy(update={"stops": multiple_stops[:1]}).num_students == 5
+        route.stops = []
+        assert route.num_students == 0
+    
+    @pytest.mark.parametrize("deep_copy", [
+        lambda route: route.model_copy(deep=True),
+        copy.deepcopy,
+    ], ids=["model_copy_deep", "copy_deepcopy"])
+    def test_route_num_students_recomputed_after_deep_copy(self, entry_route, deep_copy):
+        """Test a deep copy drops the cache, so editing its stops shows up."""
+        assert entry_route.num_students == 20
+        
+        copied = deep_copy(entry_route)
+        copied.stops[0].passengers += 10
+        
+        assert copied.num_students == 30
+        assert entry_route.num_students == 20
+    
     def test_route_num_students_empty_stops(self):
         """Test num_students with empty stops."""
         route = Route(
@@ -143,12 +184,19 @@ class TestRoute:
         )
         assert route.days == []
     
-    def test_route_serialization(self, entry_route):
+    @pytest.fixture(scope="class")
+    def route_dump(self, entry_route):
+        """Serialize the entry route once for every field check."""
+        return entry_route.model_dump()
+    
+    @pytest.mark.parametrize("field,value", [
+        ("id", "R001_E1_E"),
+        ("type", "entry"),
+        ("num_students", 20),  # computed_field is included
+    ])
+    def test_route_serialization(self, route_dump, field, value):
         """Test route serialization."""
-        data = entry_route.model_dump()
-        assert data["id"] == "R001_E1_E"
-        assert data["type"] == "entry"
-        assert "num_students" in data  # computed_field is included
+        assert route_dump[field] == value
     
     def test_route_with_multiple_stops(self, multiple_stops):
         """Test route with multiple stops."""
@@ -185,11 +233,19 @@ class TestBus:
         bus = Bus(id="BUS002", capacity=60)
         assert bus.plate is None
     
-    def test_bus_serialization(self, sample_bus):
+    @pytest.fixture(scope="class")
+    def bus_dump(self, sample_bus):
+        """Serialize the sample bus once for every field check."""
+        return sample_bus.model_dump()
+    
+    @pytest.mark.parametrize("field,value", [
+        ("id", "BUS001"),
+        ("capacity", 55),
+        ("plate", "1234 ABC"),
+    ])
+    def test_bus_serialization(self, bus_dump, field, value):
         """Test bus serialization."""
-        data = sample_bus.model_dump()
-        assert data["id"] == "BUS001"
-        assert data["capacity"] == 55
+        assert bus_dump[field] == value
 
 
 # ============================================================
@@ -279,11 +335,23 @@ class TestBusSchedule:
         )
         assert schedule.last_loc is None
     
-    def test_bus_schedule_serialization(self, sample_bus_schedule):
+    @pytest.fixture(scope="class")
+    def bus_schedule_dump(self, sample_bus_schedule):
+        """Serialize the sample bus schedule once for every field check."""
+        return sample_bus_schedule.model_dump()
+    
+    @pytest.mark.parametrize("field,value", [
+        ("bus_id", "BUS001"),
+        ("last_loc", (42.25, -8.73)),
+    ])
+    def test_bus_schedule_serialization(self, bus_schedule_dump, field, value):
         """Test bus schedule serialization."""
-        data = sample_bus_schedule.model_dump()
-        assert data["bus_id"] == "BUS001"
-        assert len(data["items"]) == 1
+        assert bus_schedule_dump[field] == value
+    
+    def test_bus_schedule_serialization_items(self, bus_schedule_dump):
+        """Test serialized bus schedule items."""
+        assert len(bus_schedule_dump["items"]) == 1
+        assert bus_schedule_dump["items"][0]["route_id"] == "R001_E1_E"
 
 
 # ============================================================
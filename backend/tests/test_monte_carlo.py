@@ -7,13 +7,16 @@ sea correcto y que las unidades sean consistentes (minutos).
 """
 
 import pytest
-from datetime import time
+from datetime import date, datetime, time, timedelta
+from hypothesis import given
+from hypothesis.strategies import lists, times
 from typing import List, Dict, Tuple
 
 from models import BusSchedule, ScheduleItem
 from validation.monte_carlo import (
     check_schedule_feasibility,
     time_to_minutes,
+    time_to_minutes_arr,
     extract_travel_times_from_schedule
 )
 
@@ -25,22 +28,34 @@ from validation.monte_carlo import (
 class TestTimeToMinutes:
     """Tests para la función de conversión de tiempo."""
     
-    def test_time_to_minutes_basic(self):
-        """Test conversión básica de time a minutos."""
-        assert time_to_minutes(time(7, 0)) == 420   # 7*60 = 420
-        assert time_to_minutes(time(8, 30)) == 510  # 8*60 + 30 = 510
-        assert time_to_minutes(time(12, 0)) == 720  # 12*60 = 720
-        assert time_to_minutes(time(23, 59)) == 1439  # 23*60 + 59 = 1439
+    @given(times())
+    def test_time_to_minutes_matches_formula(self, t):
+        """Propiedad: horas*60 + minutos, ignorando segundos y microsegundos."""
+        minutes = time_to_minutes(t)
+        
+        assert minutes == t.hour * 60 + t.minute
+        assert 0 <= minutes <= 1439
+    
+    @given(times(max_value=time(23, 58, 59, 999999)))
+    def test_time_to_minutes_next_minute(self, t):
+        """Propiedad: sumar un minuto a la hora suma exactamente 1."""
+        next_minute = (datetime.combine(date.min, t) + timedelta(minutes=1)).time()
+        
+        assert time_to_minutes(next_minute) == time_to_minutes(t) + 1
     
-    def test_time_to_minutes_midnight(self):
-        """Test conversión de medianoche."""
-        assert time_to_minutes(time(0, 0)) == 0
+    def test_time_to_minutes_arr_all_day(self):
+        """Test versión por lotes sobre los 1440 minutos del día."""
+        all_day = [time(h, m) for h in range(24) for m in range(60)]
+        
+        minutes = time_to_minutes_arr(all_day)
+        
+        assert minutes.tolist() == [t.hour * 60 + t.minute for t in all_day]
+        assert minutes.tolist() == [time_to_minutes(t) for t in all_day]
     
-    def test_time_to_minutes_ignores_seconds(self):
-        """Test que ignora los segundos en la conversión."""
-        # La función actual no considera segundos
-        assert time_to_minutes(time(8, 30, 0)) == 510
-        assert time_to_minutes(time(8, 30, 45)) == 510  # Segundos ignorados
+    @given(lists(times(), max_size=50))
+    def test_time_to_minutes_arr_matches_scalar(self, values):
+        """Propiedad: la versión por lotes coincide con la escalar."""
+        assert time_to_minutes_arr(values).tolist() == [time_to_minutes(t) for t in values]
 
 
 # =============================================================================
@@ -13,13 +13,20 @@ from optimizer_v6 import (
     to_minutes,
     from_minutes,
     haversine_km,
+    haversine_km_matrix,
     haversine_travel_minutes,
     coords_valid,
     classify_block,
     compute_route_duration,
     prepare_jobs,
     build_chains_greedy,
-    precompute_block_travel_matrix
+    precompute_block_travel_matrix,
+    _compute_ml_pair_scores,
+    _dense_travel_time_matrix,
+    MAX_ENTRY_SHIFT_MINUTES,
+    MAX_EXIT_LATE_SHIFT_MINUTES,
+    MIN_CONNECTION_BUFFER_MINUTES,
+    MIN_START_HOUR,
 )
 
 
@@ -75,6 +82,16 @@ class TestUtilityFunctions:
         dist = haversine_km(0, 0, 42.24, -8.72)
         assert dist == 999.0
     
+    def test_haversine_km_matrix_matches_scalar(self):
+        """Test vectorized haversine agrees with the scalar version pairwise."""
+        sources = [(42.24, -8.72), (42.25, -8.73), (0.0, -8.72)]
+        destinations = [(42.2400, -8.7100), (42.26, -8.70)]
+        matrix = haversine_km_matrix(sources, destinations)
+        assert matrix.shape == (3, 2)
+        for i, (lat1, lon1) in enumerate(sources):
+            for j, (lat2, lon2) in enumerate(destinations):
+                assert matrix[i, j] == pytest.approx(haversine_km(lat1, lon1, lat2, lon2))
+    
     def test_haversine_travel_minutes(self):
         """Test travel time calculation."""
         minutes = haversine_travel_minutes(42.24, -8.72, 42.25, -8.73)
@@ -333,6 +350,11 @@ class TestOptimizer:
         rebalanced = optimize_v6(optimizer_test_routes, balance_load=True)
         assert _assigned_route_ids(rebalanced) == _assigned_route_ids(baseline)
 
+    def test_optimize_v6_zero_time_budget_assigns_all_routes(self, optimizer_test_routes):
+        """Test an exhausted time budget skips local search but keeps a full solution."""
+        result = optimize_v6(optimizer_test_routes, time_budget_sec=0)
+        assert _assigned_route_ids(result) == sorted(r.id for r in optimizer_test_routes)
+
     def test_rebalance_reduces_or_keeps_spread(self, optimizer_test_routes):
         """Load rebalance should improve or keep route spread across buses."""
         baseline = optimize_v6(optimizer_test_routes, balance_load=False)
@@ -476,6 +498,42 @@ class TestChainBuilding:
         """Test travel matrix with empty job list."""
         matrix = precompute_block_travel_matrix([], True)
         assert matrix == {}
+    
+    def test_dense_travel_time_matrix(self):
+        """Test dict -> dense matrix conversion leaves missing pairs as NaN."""
+        import math
+        
+        matrix = _dense_travel_time_matrix(3, {(0, 1): 12, (2, 0): 7})
+        
+        assert matrix.shape == (3, 3)
+        assert matrix[0, 1] == 12 and matrix[2, 0] == 7
+        assert sum(math.isnan(v) for v in matrix.ravel()) == 7
+    
+    def test_ml_pair_scores_match_dict_path(self, optimizer_test_routes):
+        """Test the matrix-fed ML scoring gives the same scores as the dict path."""
+        from services.ml_assignment_service import build_ml_pair_scores
+        
+        jobs = prepare_jobs(optimizer_test_routes)[1]
+        n = len(jobs)
+        # Synthetic travel times (no OSRM), with one pair left missing
+        travel_times = {
+            (i, j): 5 + (3 * i + 7 * j) % 20
+            for i in range(n) for j in range(n)
+            if i != j and (i, j) != (n - 1, 0)
+        }
+        
+        scores = _compute_ml_pair_scores(jobs, travel_times, True)
+        
+        assert len(scores) == n * (n - 1)
+        assert scores == build_ml_pair_scores(
+            jobs,
+            travel_times,
+            is_entry=True,
+            min_buffer_minutes=float(MIN_CONNECTION_BUFFER_MINUTES),
+            max_early_arrival_minutes=int(MAX_ENTRY_SHIFT_MINUTES),
+            max_exit_shift_minutes=int(MAX_EXIT_LATE_SHIFT_MINUTES),
+            min_start_hour=int(MIN_START_HOUR),
+        )
 
 
 # ============================================================
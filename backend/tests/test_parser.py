@@ -247,6 +247,30 @@ class TestExcelParsing:
             elif route.type == "exit":
                 assert route.departure_time is not None or route.arrival_time is not None
     
+    def test_excel_readers_produce_same_routes(self, tmp_path, monkeypatch):
+        """Test calamine and openpyxl read-only paths parse identical routes."""
+        pytest.importorskip("python_calamine")
+        import parser as parser_module
+        from openpyxl import Workbook
+        from tests.fixtures import generate_sample_excel as sample
+
+        workbook_path = str(tmp_path / "sample.xlsx")
+        wb = Workbook()
+        wb.remove(wb.active)
+        sample._write_sheet(wb, 'I. Rutas', sample.rutas_data)
+        sample._write_sheet(wb, 'I. Rutas (2)', sample.rutas_2_data)
+        sample._write_sheet(wb, 'II. Paradas', sample.paradas_data)
+        sample._write_sheet(wb, 'III. Expedicions', sample.expedicions_data)
+        wb.save(workbook_path)
+
+        monkeypatch.setattr(parser_module, "CALAMINE_AVAILABLE", True)
+        calamine_routes = parse_routes(workbook_path)
+        monkeypatch.setattr(parser_module, "CALAMINE_AVAILABLE", False)
+        openpyxl_routes = parse_routes(workbook_path)
+
+        assert len(calamine_routes) > 0
+        assert [r.model_dump() for r in calamine_routes] == [r.model_dump() for r in openpyxl_routes]
+    
     def test_parse_nonexistent_file(self):
         """Test parsing a non-existent file."""
         routes = parse_routes("/nonexistent/file.xlsx")
@@ -19,8 +19,12 @@ from router_service import (
 
 
 @pytest.fixture(autouse=True)
-def _clean_router_state():
+def _clean_router_state(tmp_path, monkeypatch):
     """Reset travel-time cache and negative cache between every test."""
+    # Persist the OSRM cache under tmp_path instead of the working directory
+    cache_file = tmp_path / "osrm_cache.json"
+    monkeypatch.setattr(_rs, "CACHE_FILE_PATH", cache_file)
+    monkeypatch.setattr(_rs, "CACHE_FILE", str(cache_file))
     _rs._travel_time_cache.clear()
     _rs._negative_cache.clear()
     _rs._osrm_failure_streak = 0
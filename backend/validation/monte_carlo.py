@@ -8,10 +8,13 @@ que el schedule siga siendo factible en condiciones reales.
 import math
 import random
 import statistics
-from typing import List, Callable, Dict, Tuple, Optional, Any
+from typing import TYPE_CHECKING, List, Callable, Dict, Tuple, Optional, Any
 from dataclasses import dataclass
 from datetime import time
 
+if TYPE_CHECKING:
+    import numpy as np
+
 try:
     from backend.models import Route, BusSchedule, ScheduleItem
 except ImportError:
@@ -412,9 +415,27 @@ class MonteCarloValidator:
         )
 
 
+# Tabla time(h, m) -> minutos para los 1440 minutos del día
+_MINUTES_BY_TIME: Dict[time, int] = {
+    time(h, m): h * 60 + m for h in range(24) for m in range(60)
+}
+
+
 def time_to_minutes(t: time) -> int:
-    """Convertir time a minutos desde medianoche."""
-    return t.hour * 60 + t.minute
+    """Convertir time a minutos desde medianoche (ignora segundos)."""
+    minutes = _MINUTES_BY_TIME.get(t)
+    if minutes is None:  # Con segundos/microsegundos: no está en la tabla
+        return t.hour * 60 + t.minute
+    return minutes
+
+
+def time_to_minutes_arr(times: List[time]) -> "np.ndarray":
+    """Versión por lotes de time_to_minutes: array int32 de minutos desde medianoche."""
+    import numpy as np  # deferred: solo el camino por lotes lo necesita
+
+    return np.fromiter(
+        (time_to_minutes(t) for t in times), dtype=np.int32, count=len(times)
+    )
 
 
 def check_schedule_feasibility(